@@ -0,0 +1,242 @@
+import json
+import random
+import threading
+import time
+import urllib.parse
+
+import pandas as pd
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+
+# --- HTTP KATMANI ---
+HTTP_DENEME = 1
+HTTP_BEKLEME_TABAN = 0.4
+HTTP_BEKLEME_UST = 3.0
+DEVRE_ESIGI = 3
+DEVRE_SURESI = 120
+YENIDEN_DENENEN_KODLAR = {429, 500, 502, 503, 504}
+
+
+@st.cache_resource
+def http_durumu():
+    return {"oturumlar": {}, "saglayicilar": {}, "kilit": threading.Lock()}
+
+
+# Arka plan iş parçacıkları st.* çağıramadığından paylaşılan nesneler modül yüklenirken
+# bir kez alınır ve modül değişkeni üzerinden kullanılır
+HTTP_DURUMU = http_durumu()
+
+
+def http_oturumu(host):
+    durum = HTTP_DURUMU
+    with durum["kilit"]:
+        oturum = durum["oturumlar"].get(host)
+        if oturum is None:
+            oturum = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8)
+            oturum.mount("https://", adapter)
+            oturum.mount("http://", adapter)
+            durum["oturumlar"][host] = oturum
+        return oturum
+
+
+def saglayici_kaydi(saglayici):
+    # Çağıran http_durumu kilidini tutuyor olmalı
+    return HTTP_DURUMU["saglayicilar"].setdefault(
+        saglayici,
+        {
+            "istek": 0,
+            "hata": 0,
+            "ardisik_hata": 0,
+            "toplam_sure": 0.0,
+            "son_sure": 0.0,
+            "son_hata": "",
+            "acik_kadar": 0.0,
+        },
+    )
+
+
+def devre_acik(saglayici):
+    durum = HTTP_DURUMU
+    with durum["kilit"]:
+        return saglayici_kaydi(saglayici)["acik_kadar"] > time.time()
+
+
+def olcum_kaydet(saglayici, sure, basarili, hata=""):
+    durum = HTTP_DURUMU
+    with durum["kilit"]:
+        k = saglayici_kaydi(saglayici)
+        k["istek"] += 1
+        k["toplam_sure"] += sure
+        k["son_sure"] = sure
+        if basarili:
+            k["ardisik_hata"] = 0
+            k["acik_kadar"] = 0.0
+        else:
+            k["hata"] += 1
+            k["ardisik_hata"] += 1
+            k["son_hata"] = hata[:200]
+            if k["ardisik_hata"] >= DEVRE_ESIGI:
+                k["acik_kadar"] = time.time() + DEVRE_SURESI
+
+
+def http_istek(yontem, url, saglayici, deneme=HTTP_DENEME, **kwargs):
+    # Host başına havuzlu oturum; geçici hatalarda jitter'lı üstel bekleme ile yeniden dener.
+    # Sağlayıcının devresi açıksa hiç istek atmadan hata fırlatır.
+    if devre_acik(saglayici):
+        raise RuntimeError(f"{saglayici} devresi açık, istek atlandı")
+    oturum = http_oturumu(urllib.parse.urlsplit(url).netloc)
+    for i in range(deneme + 1):
+        t0 = time.perf_counter()
+        try:
+            r = oturum.request(yontem, url, **kwargs)
+        except requests.RequestException as e:
+            olcum_kaydet(saglayici, time.perf_counter() - t0, False, str(e))
+            if i == deneme or devre_acik(saglayici):
+                raise
+        else:
+            if r.status_code not in YENIDEN_DENENEN_KODLAR:
+                olcum_kaydet(saglayici, time.perf_counter() - t0, True)
+                return r
+            olcum_kaydet(
+                saglayici, time.perf_counter() - t0, False, f"HTTP {r.status_code}"
+            )
+            if i == deneme or devre_acik(saglayici):
+                return r
+            # stream=True yanıtlarında bağlantı ancak kapatılınca havuza döner
+            r.close()
+        bekleme = min(HTTP_BEKLEME_UST, HTTP_BEKLEME_TABAN * (2**i))
+        time.sleep(bekleme * random.uniform(0.5, 1.5))
+
+
+def http_durum_tablosu():
+    durum = HTTP_DURUMU
+    satirlar = []
+    with durum["kilit"]:
+        for ad, k in sorted(durum["saglayicilar"].items()):
+            satirlar.append(
+                {
+                    "Sağlayıcı": ad,
+                    "İstek": k["istek"],
+                    "Hata": k["hata"],
+                    "Ort. ms": (k["toplam_sure"] / k["istek"] * 1000) if k["istek"] else 0.0,
+                    "Son ms": k["son_sure"] * 1000,
+                    "Devre": "açık" if k["acik_kadar"] > time.time() else "kapalı",
+                    "Son Hata": k["son_hata"],
+                }
+            )
+    return pd.DataFrame(satirlar)
+
+
+# --- GITHUB GIT DATA API ---
+@st.cache_resource
+def github_durumu():
+    # Son bilinen dal ucu ve ağaç SHA'ları; her yazımdan önce GET atmamak için tutulur
+    return {"uclar": {}, "kilit": threading.Lock()}
+
+
+GITHUB_DURUMU = github_durumu()
+
+
+def github_ayarlari():
+    try:
+        if "GITHUB_TOKEN" not in st.secrets:
+            return None
+        return {
+            "token": st.secrets["GITHUB_TOKEN"],
+            "repo": st.secrets["GITHUB_REPO"],
+            "dal": st.secrets.get("GITHUB_BRANCH", "main"),
+            "api": st.secrets.get("GITHUB_API_URL", "https://api.github.com").rstrip("/"),
+        }
+    except:
+        return None
+
+
+def github_istek(ayar, yontem, yol, **kwargs):
+    return http_istek(
+        yontem,
+        f"{ayar['api']}/repos/{ayar['repo']}/{yol}",
+        "github",
+        deneme=0 if yontem != "GET" else HTTP_DENEME,
+        headers={
+            "Authorization": f"token {ayar['token']}",
+            "Accept": "application/vnd.github.v3+json",
+        },
+        timeout=15,
+        **kwargs,
+    )
+
+
+def github_hata_mesaji(r):
+    try:
+        return r.json().get("message", f"HTTP {r.status_code}")
+    except:
+        return f"HTTP {r.status_code}"
+
+
+def github_dal_ucu(ayar, yenile=False):
+    anahtar = (ayar["api"], ayar["repo"], ayar["dal"])
+    with GITHUB_DURUMU["kilit"]:
+        uc = GITHUB_DURUMU["uclar"].get(anahtar)
+    if uc and not yenile:
+        return uc
+    r = github_istek(ayar, "GET", f"git/ref/heads/{ayar['dal']}")
+    if r.status_code != 200:
+        raise RuntimeError(github_hata_mesaji(r))
+    commit_sha = r.json()["object"]["sha"]
+    r = github_istek(ayar, "GET", f"git/commits/{commit_sha}")
+    if r.status_code != 200:
+        raise RuntimeError(github_hata_mesaji(r))
+    uc = {"commit": commit_sha, "agac": r.json()["tree"]["sha"]}
+    with GITHUB_DURUMU["kilit"]:
+        GITHUB_DURUMU["uclar"][anahtar] = uc
+    return uc
+
+
+def github_commit_olustur(ayar, dosyalar, mesaj):
+    # Tüm dosyalar tek ağaç + tek commit olarak yazılır (Git Data API).
+    # veri None ise dosya silinir. Dal ucu ilerlemişse bir kez tazelenip yeniden denenir.
+    agac = []
+    for dosya_adi, veri in dosyalar.items():
+        girdi = {"path": dosya_adi, "mode": "100644", "type": "blob"}
+        if veri is None:
+            girdi["sha"] = None
+        else:
+            girdi["content"] = veri if isinstance(veri, str) else json.dumps(veri, indent=2)
+        agac.append(girdi)
+
+    for deneme in range(2):
+        uc = github_dal_ucu(ayar, yenile=deneme > 0)
+        r = github_istek(
+            ayar, "POST", "git/trees", json={"base_tree": uc["agac"], "tree": agac}
+        )
+        if r.status_code != 201:
+            raise RuntimeError(github_hata_mesaji(r))
+        yeni_agac = r.json()["sha"]
+        r = github_istek(
+            ayar,
+            "POST",
+            "git/commits",
+            json={"message": mesaj, "tree": yeni_agac, "parents": [uc["commit"]]},
+        )
+        if r.status_code != 201:
+            raise RuntimeError(github_hata_mesaji(r))
+        yeni_commit = r.json()["sha"]
+        r = github_istek(
+            ayar,
+            "PATCH",
+            f"git/refs/heads/{ayar['dal']}",
+            json={"sha": yeni_commit, "force": False},
+        )
+        if r.status_code == 200:
+            with GITHUB_DURUMU["kilit"]:
+                GITHUB_DURUMU["uclar"][(ayar["api"], ayar["repo"], ayar["dal"])] = {
+                    "commit": yeni_commit,
+                    "agac": yeni_agac,
+                }
+            return yeni_commit
+        if r.status_code not in [409, 422] or deneme > 0:
+            raise RuntimeError(github_hata_mesaji(r))
+    raise RuntimeError("GitHub dal ucu güncellenemedi")
@@ -7,107 +7,770 @@ from bs4 import BeautifulSoup
 import os
 import html
 import urllib.parse
+from collections import OrderedDict
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
 from email.utils import parsedate_to_datetime
 import plotly.express as px
-import base64
+import atexit
+import hashlib
+import random
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
 import numpy as np
+from ag_katmani import (
+    devre_acik,
+    github_ayarlari,
+    github_commit_olustur,
+    http_durum_tablosu,
+    http_istek,
+    olcum_kaydet,
+)
 
 
-# --- GITHUB OTOMATIK KAYIT FONKSIYONU ---
-def github_a_kaydet(dosya_adi, veri):
+# --- ARKA PLAN GITHUB SENKRONU (WRITE-BEHIND) ---
+SENKRON_GECIKMESI = 3.0
+SENKRON_HATA_BEKLEMESI = 30.0
+SENKRON_KAPANIS_BEKLEMESI = 20.0
+SENKRON_GUNLUGU = ".github_senkron_kuyrugu.json"
+
+
+@st.cache_resource
+def senkron_kuyrugu():
+    # Dosya başına en son içerik tutulur; işçi kısa bir sessizlikten sonra hepsini tek commit'te yazar
+    kuyruk = {
+        "bekleyen": {},
+        "gonderilen": {},
+        "hatalar": {},
+        "son_basarili": None,
+        "son_degisiklik": 0.0,
+        "ayar": None,
+        "gonderiliyor": False,
+        "kapaniyor": False,
+        "kosul": threading.Condition(),
+    }
+    if os.path.exists(SENKRON_GUNLUGU):
+        try:
+            with open(SENKRON_GUNLUGU, "r") as f:
+                for dosya_adi in json.load(f):
+                    if os.path.exists(dosya_adi):
+                        with open(dosya_adi, "r") as g:
+                            kuyruk["bekleyen"][dosya_adi] = g.read()
+                    else:
+                        kuyruk["bekleyen"][dosya_adi] = None
+        except:
+            pass
+    threading.Thread(
+        target=senkron_iscisi, args=(kuyruk,), name="github-senkron", daemon=True
+    ).start()
+    atexit.register(senkron_bosalt, kuyruk)
+    return kuyruk
+
+
+def senkron_gunlugu_yaz(kuyruk):
+    # Çağıran kuyruk kilidini tutuyor olmalı
+    adlar = sorted(set(kuyruk["bekleyen"]) | set(kuyruk["gonderilen"]))
     try:
-        with open(dosya_adi, "w") as f:
-            json.dump(veri, f, indent=2)
-
-        if "GITHUB_TOKEN" in st.secrets:
-            token = st.secrets["GITHUB_TOKEN"]
-            repo = st.secrets["GITHUB_REPO"]
-            url = f"https://api.github.com/repos/{repo}/contents/{dosya_adi}"
-            headers = {
-                "Authorization": f"token {token}",
-                "Accept": "application/vnd.github.v3+json",
-            }
+        if adlar:
+            with open(SENKRON_GUNLUGU, "w") as f:
+                json.dump(adlar, f)
+        elif os.path.exists(SENKRON_GUNLUGU):
+            os.remove(SENKRON_GUNLUGU)
+    except:
+        pass
 
-            r = requests.get(url, headers=headers)
-            sha = r.json().get("sha") if r.status_code == 200 else None
 
-            content = base64.b64encode(json.dumps(veri, indent=2).encode()).decode()
-            data = {
-                "message": f"Finans Güncelleme: {dosya_adi} - {datetime.now().strftime('%Y-%m-%d %H:%M')}",
-                "content": content,
-                "branch": "main",
-            }
-            if sha:
-                data["sha"] = sha
+def senkron_gonder(kuyruk, paket, ayar):
+    adlar = ", ".join(paket)
+    try:
+        github_commit_olustur(
+            ayar,
+            paket,
+            f"Finans Güncelleme: {adlar} - {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+        )
+        hata = None
+    except Exception as e:
+        hata = str(e)
+    with kuyruk["kosul"]:
+        kuyruk["gonderilen"] = {}
+        kuyruk["gonderiliyor"] = False
+        kuyruk["kosul"].notify_all()
+        if hata is None:
+            for dosya_adi in paket:
+                kuyruk["hatalar"].pop(dosya_adi, None)
+            kuyruk["son_basarili"] = datetime.now()
+        else:
+            for dosya_adi, icerik in paket.items():
+                kuyruk["hatalar"][dosya_adi] = hata
+                kuyruk["bekleyen"].setdefault(dosya_adi, icerik)
+            kuyruk["son_degisiklik"] = time.time() + SENKRON_HATA_BEKLEMESI
+        senkron_gunlugu_yaz(kuyruk)
+
+
+def senkron_iscisi(kuyruk):
+    kosul = kuyruk["kosul"]
+    while True:
+        with kosul:
+            while not (kuyruk["bekleyen"] and kuyruk["ayar"]) and not kuyruk["kapaniyor"]:
+                kosul.wait()
+            if kuyruk["kapaniyor"]:
+                return
+            kalan = kuyruk["son_degisiklik"] + SENKRON_GECIKMESI - time.time()
+            if kalan > 0:
+                kosul.wait(kalan)
+                continue
+            paket, kuyruk["bekleyen"] = kuyruk["bekleyen"], {}
+            kuyruk["gonderilen"] = paket
+            kuyruk["gonderiliyor"] = True
+            ayar = kuyruk["ayar"]
+        senkron_gonder(kuyruk, paket, ayar)
+
+
+def senkron_bosalt(kuyruk):
+    # Süreç kapanırken işçi durdurulur, elindeki commit bitene kadar beklenir ve kalanlar
+    # tek commit'te yazılır. İşçi zamanında bitmezse eski içeriğin yenisini ezmemesi için
+    # yazılmaz; dosya adları günlükte kaldığından sonraki açılışta yeniden gönderilir.
+    with kuyruk["kosul"]:
+        kuyruk["kapaniyor"] = True
+        kuyruk["kosul"].notify_all()
+        if not kuyruk["kosul"].wait_for(
+            lambda: not kuyruk["gonderiliyor"], timeout=SENKRON_KAPANIS_BEKLEMESI
+        ):
+            return
+        ayar = kuyruk["ayar"]
+        if not (kuyruk["bekleyen"] and ayar):
+            return
+        paket, kuyruk["bekleyen"] = kuyruk["bekleyen"], {}
+        kuyruk["gonderilen"] = paket
+        kuyruk["gonderiliyor"] = True
+    senkron_gonder(kuyruk, paket, ayar)
 
-            put_res = requests.put(url, headers=headers, json=data)
 
-            if put_res.status_code not in [200, 201]:
-                st.error(
-                    f"GitHub Hatası ({dosya_adi}): {put_res.json().get('message')}"
-                )
+SENKRON_KUYRUGU = senkron_kuyrugu()
+
+
+def senkron_ayarini_tazele():
+    kuyruk = SENKRON_KUYRUGU
+    with kuyruk["kosul"]:
+        kuyruk["ayar"] = github_ayarlari()
+        kuyruk["kosul"].notify_all()
+
+
+senkron_ayarini_tazele()
+
+
+def senkron_kuyruguna_ekle(dosyalar):
+    ayar = github_ayarlari()
+    if not ayar:
+        return
+    kuyruk = SENKRON_KUYRUGU
+    with kuyruk["kosul"]:
+        for dosya_adi, veri in dosyalar.items():
+            if veri is None or isinstance(veri, str):
+                kuyruk["bekleyen"][dosya_adi] = veri
             else:
-                st.toast(f"GitHub: {dosya_adi} güncellendi! ✅")
+                kuyruk["bekleyen"][dosya_adi] = json.dumps(veri, indent=2)
+        kuyruk["son_degisiklik"] = time.time()
+        senkron_gunlugu_yaz(kuyruk)
+        kuyruk["kosul"].notify_all()
+
+
+def senkron_durum_goster():
+    kuyruk = SENKRON_KUYRUGU
+    with kuyruk["kosul"]:
+        bekleyen = sorted(set(kuyruk["bekleyen"]) | set(kuyruk["gonderilen"]))
+        hatalar = dict(kuyruk["hatalar"])
+        son_basarili = kuyruk["son_basarili"]
+    for dosya_adi, hata in hatalar.items():
+        st.sidebar.error(f"GitHub senkron hatası ({dosya_adi}): {hata}")
+    if bekleyen:
+        st.sidebar.caption(f"⏳ GitHub'a yazılmayı bekleyen: {', '.join(bekleyen)}")
+    elif son_basarili:
+        st.sidebar.caption(f"✅ GitHub senkron: {son_basarili.strftime('%H:%M:%S')}")
+
+
+def github_coklu_kaydet(dosyalar):
+    # Yerel JSON hemen yazılır; GitHub'a yazım arka plandaki kuyruğa bırakılır
+    try:
+        dosyalar = {d: veri_dogrula(d, v) for d, v in dosyalar.items()}
+        if SQLITE_DEPOSU:
+            sqlite_belgeleri_yaz(dosyalar)
+        for dosya_adi, veri in dosyalar.items():
+            if veri is None:
+                if os.path.exists(dosya_adi):
+                    os.remove(dosya_adi)
+                continue
+            with open(dosya_adi, "w") as f:
+                json.dump(veri, f, indent=2)
+        senkron_kuyruguna_ekle(dosyalar)
     except Exception as e:
         st.error(f"Sistem Hatası: {str(e)}")
 
 
+def github_a_kaydet(dosya_adi, veri):
+    github_coklu_kaydet({dosya_adi: veri})
+
+
 # --- VERİ YÖNETİMİ ---
+def temizle_sayi(v):
+    if isinstance(v, str):
+        return float(
+            v.replace("₺", "")
+            .replace("$", "")
+            .replace(",", "")
+            .replace("%", "")
+            .strip()
+        )
+    return float(v)
+
+
+def varlik_sema_v1(data):
+    for kat in data:
+        for vid in data[kat]:
+            if not isinstance(data[kat][vid], dict):
+                data[kat][vid] = {
+                    "miktar": data[kat][vid],
+                    "maliyet_usd": 0.0,
+                }
+    return data
+
+
+def butce_sema_v1(data):
+    giderler = data.setdefault("giderler", {})
+    kredi_kartlari = giderler.setdefault("Kredi Kartlari", {})
+    aylik_sabit_gider_bilgi = data.setdefault("aylik_sabit_gider_bilgi", {})
+    for kart_adi, kart_veri in list(kredi_kartlari.items()):
+        if isinstance(kart_veri, dict):
+            if "tutar" in kart_veri:
+                kredi_kartlari[kart_adi] = float(kart_veri.get("tutar", 0.0))
+            elif "kart_toplami" in kart_veri:
+                kredi_kartlari[kart_adi] = float(kart_veri.get("kart_toplami", 0.0))
+            elif isinstance(kart_veri.get("duzenli_odemeler"), dict):
+                kredi_kartlari[kart_adi] = float(
+                    sum(kart_veri["duzenli_odemeler"].values())
+                )
+            else:
+                kredi_kartlari[kart_adi] = 0.0
+        else:
+            kredi_kartlari[kart_adi] = float(kart_veri)
+    for kalem, kayit in list(aylik_sabit_gider_bilgi.items()):
+        if isinstance(kayit, dict):
+            try:
+                tutar = float(kayit.get("tutar", 0.0))
+            except:
+                tutar = 0.0
+            bitis_tarihi = str(kayit.get("bitis_tarihi", "")).strip()
+        else:
+            try:
+                tutar = float(kayit)
+            except:
+                tutar = 0.0
+            bitis_tarihi = ""
+        aylik_sabit_gider_bilgi[kalem] = {
+            "tutar": tutar,
+            "bitis_tarihi": bitis_tarihi,
+        }
+    return data
+
+
+# Dosya başına sıralı şema geçişleri; dosyadaki "_sema" sürümünden sonrakiler bir kez
+# uygulanır ve sonuç geri yazılır
+SEMA_GECISLERI = {
+    "varliklarim.json": [varlik_sema_v1],
+    "butce.json": [butce_sema_v1],
+}
+
+
+def sonlu_sayi(deger, yer):
+    try:
+        sayi = float(deger)
+    except (TypeError, ValueError):
+        raise ValueError(f"{yer}: sayı bekleniyordu, '{deger}' geldi")
+    if not np.isfinite(sayi):
+        raise ValueError(f"{yer}: geçersiz sayı ({deger})")
+    return sayi
+
+
+def veri_dogrula(dosya_adi, veri):
+    # Yazımdan önce şekil kontrolü; geçerli ve sürüm damgalı bir kopya döner
+    if veri is None or isinstance(veri, str) or dosya_adi not in SEMA_GECISLERI:
+        return veri
+    if dosya_adi == "varliklarim.json":
+        temiz = {}
+        for kat, varliklar in veri.items():
+            temiz[kat] = {}
+            for vid, kayit in varliklar.items():
+                temiz[kat][vid] = {
+                    "miktar": sonlu_sayi(kayit["miktar"], f"{kat}/{vid}"),
+                    "maliyet_usd": sonlu_sayi(kayit["maliyet_usd"], f"{kat}/{vid}"),
+                }
+    else:
+        temiz = {
+            "gelirler": {
+                k: sonlu_sayi(v, f"gelirler/{k}") for k, v in veri["gelirler"].items()
+            },
+            "giderler": {
+                kat: {n: sonlu_sayi(v, f"{kat}/{n}") for n, v in kalemler.items()}
+                for kat, kalemler in veri["giderler"].items()
+            },
+            "aylik_sabit_gider_bilgi": {
+                k: {
+                    "tutar": sonlu_sayi(v["tutar"], f"aylik_sabit_gider_bilgi/{k}"),
+                    "bitis_tarihi": str(v.get("bitis_tarihi", "")).strip(),
+                }
+                for k, v in veri.get("aylik_sabit_gider_bilgi", {}).items()
+            },
+        }
+    temiz["_sema"] = len(SEMA_GECISLERI[dosya_adi])
+    return temiz
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def json_dosyasi_oku(dosya_adi, mtime_ns, boyut):
+    # Anahtar (yol, mtime, boyut); değişmemiş dosya yeniden ayrıştırılmaz.
+    # Dosya yeniden yazıldıkça eski sürümler birikmesin diye önbellek küçük tutulur.
+    with open(dosya_adi, "r") as f:
+        return json.load(f)
+
+
 def veri_yukle(dosya_adi, varsayilan):
-    if not os.path.exists(dosya_adi):
+    if SQLITE_DEPOSU and dosya_adi in SQLITE_BELGELERI:
+        return sqlite_belge_oku(dosya_adi, varsayilan)
+    return json_veri_yukle(dosya_adi, varsayilan)
+
+
+def json_veri_yukle(dosya_adi, varsayilan):
+    try:
+        durum = os.stat(dosya_adi)
+    except OSError:
         return varsayilan
-    with open(dosya_adi, "r") as f:
+    try:
+        data = json_dosyasi_oku(dosya_adi, durum.st_mtime_ns, durum.st_size)
+    except:
+        return varsayilan
+    gecisler = SEMA_GECISLERI.get(dosya_adi)
+    if not gecisler or not isinstance(data, dict):
+        return data
+    surum = data.pop("_sema", 0)
+    if surum < len(gecisler):
         try:
-            data = json.load(f)
-            if dosya_adi == "varliklarim.json":
-                for kat in data:
-                    for vid in data[kat]:
-                        if not isinstance(data[kat][vid], dict):
-                            data[kat][vid] = {
-                                "miktar": data[kat][vid],
-                                "maliyet_usd": 0.0,
-                            }
-            if dosya_adi == "butce.json":
-                giderler = data.setdefault("giderler", {})
-                kredi_kartlari = giderler.setdefault("Kredi Kartlari", {})
-                aylik_sabit_gider_bilgi = data.setdefault("aylik_sabit_gider_bilgi", {})
-                for kart_adi, kart_veri in list(kredi_kartlari.items()):
-                    if isinstance(kart_veri, dict):
-                        if "tutar" in kart_veri:
-                            kredi_kartlari[kart_adi] = float(kart_veri.get("tutar", 0.0))
-                        elif "kart_toplami" in kart_veri:
-                            kredi_kartlari[kart_adi] = float(
-                                kart_veri.get("kart_toplami", 0.0)
-                            )
-                        elif isinstance(kart_veri.get("duzenli_odemeler"), dict):
-                            kredi_kartlari[kart_adi] = float(
-                                sum(kart_veri["duzenli_odemeler"].values())
-                            )
-                        else:
-                            kredi_kartlari[kart_adi] = 0.0
-                    else:
-                        kredi_kartlari[kart_adi] = float(kart_veri)
-                for kalem, kayit in list(aylik_sabit_gider_bilgi.items()):
-                    if isinstance(kayit, dict):
-                        try:
-                            tutar = float(kayit.get("tutar", 0.0))
-                        except:
-                            tutar = 0.0
-                        bitis_tarihi = str(kayit.get("bitis_tarihi", "")).strip()
-                    else:
-                        try:
-                            tutar = float(kayit)
-                        except:
-                            tutar = 0.0
-                        bitis_tarihi = ""
-                    aylik_sabit_gider_bilgi[kalem] = {
-                        "tutar": tutar,
-                        "bitis_tarihi": bitis_tarihi,
-                    }
-            return data
+            for gecis in gecisler[surum:]:
+                data = gecis(data)
         except:
             return varsayilan
+        github_a_kaydet(dosya_adi, data)
+    return data
+
+
+# --- ARŞİV (APPEND-ONLY JSONL SEGMENTLERİ) ---
+ARSIV_SEGMENT_BOYUTU = 200
+
+
+def arsiv_segmentleri(arsiv):
+    if not os.path.isdir(arsiv):
+        return []
+    return sorted(f"{arsiv}/{ad}" for ad in os.listdir(arsiv) if ad.endswith(".jsonl"))
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def arsiv_segmenti_oku(yol, mtime_ns, boyut):
+    # Her eklemede yalnızca son segmentin anahtarı değişir; sınır eski sürümlerini düşürür
+    kayitlar = []
+    with open(yol, "r") as f:
+        for satir in f:
+            satir = satir.strip()
+            if not satir:
+                continue
+            try:
+                kayitlar.append(json.loads(satir))
+            except:
+                continue
+    return kayitlar
+
+
+def arsiv_oku(arsiv, baslangic=None, bitis=None):
+    # Kayıtlar segment segment akıtılır; değişmemiş segment (mtime/boyut) yeniden okunmaz.
+    # baslangic/bitis "YYYY-MM-DD HH:MM" biçimli metinlerle karşılaştırılır (dahil).
+    if SQLITE_DEPOSU:
+        yield from sqlite_arsiv_oku(arsiv, baslangic, bitis)
+        return
+    for yol in arsiv_segmentleri(arsiv):
+        durum = os.stat(yol)
+        for kayit in arsiv_segmenti_oku(yol, durum.st_mtime_ns, durum.st_size):
+            tarih = kayit.get("tarih", "")
+            if (baslangic and tarih < baslangic) or (bitis and tarih > bitis):
+                continue
+            yield kayit
+
+
+def son_arsiv_kaydi(arsiv):
+    if SQLITE_DEPOSU:
+        return sqlite_son_arsiv_kaydi(arsiv)
+    for yol in reversed(arsiv_segmentleri(arsiv)):
+        durum = os.stat(yol)
+        kayitlar = arsiv_segmenti_oku(yol, durum.st_mtime_ns, durum.st_size)
+        if kayitlar:
+            return kayitlar[-1]
+    return None
+
+
+def arsiv_tarih_sinirlari(arsiv):
+    if SQLITE_DEPOSU:
+        return sqlite_arsiv_tarih_sinirlari(arsiv)
+    # Geriye dönük doldurulan kayıtlar dosya sırasını bozabildiğinden en küçük/büyük tarih aranır
+    tarihler = [k["tarih"] for k in arsiv_oku(arsiv)]
+    return (min(tarihler), max(tarihler)) if tarihler else (None, None)
+
+
+def tarih_araligi_sec(arsiv, anahtar):
+    # Arşivin ilk/son kaydına göre sınırlanmış tarih aralığı seçici; (baslangic, bitis) metinleri döner
+    ilk, son = arsiv_tarih_sinirlari(arsiv)
+    if not ilk:
+        return None, None
+    ilk_gun = datetime.strptime(ilk[:10], "%Y-%m-%d").date()
+    son_gun = datetime.strptime(son[:10], "%Y-%m-%d").date()
+    secim = st.date_input(
+        "Tarih Aralığı",
+        value=(ilk_gun, son_gun),
+        min_value=ilk_gun,
+        max_value=son_gun,
+        # Arşiv sınırları değişince (yeni/doldurulan kayıt) seçim tam aralığa döner
+        key=f"{anahtar}_{ilk_gun}_{son_gun}",
+    )
+    if not isinstance(secim, (tuple, list)) or len(secim) != 2:
+        return None, None
+    return f"{secim[0]:%Y-%m-%d} 00:00", f"{secim[1]:%Y-%m-%d} 23:59"
+
+
+def arsiv_kaydi_dogrula(kayit):
+    # Sayısal alanlar (biçimlenmiş "₺1,234" / "+2.50%" dahil) sayıya çevrilip sonlu mu diye
+    # bakılır; sayı olmayan metinler olduğu gibi kabul edilir
+    for alan, deger in kayit.items():
+        if isinstance(deger, bool) or not isinstance(deger, (int, float, str)):
+            continue
+        try:
+            sayi = temizle_sayi(deger)
+        except ValueError:
+            continue
+        if not np.isfinite(sayi):
+            raise ValueError(f"Arşiv kaydında geçersiz değer: {alan}={deger}")
+    return kayit
+
+
+def arsive_ekle(arsiv, kayit):
+    arsive_toplu_ekle(arsiv, [kayit])
+
+
+def arsive_toplu_ekle(arsiv, kayitlar):
+    # Yerelde satırlar eklenir; GitHub'a yalnızca değişen, boyutu sınırlı segmentler gider
+    try:
+        for kayit in kayitlar:
+            arsiv_kaydi_dogrula(kayit)
+        if SQLITE_DEPOSU:
+            sqlite_arsive_ekle(arsiv, kayitlar)
+        segmentler = arsiv_segmentleri(arsiv)
+        yol = segmentler[-1] if segmentler else None
+        dolu = 0
+        if yol is not None:
+            with open(yol, "r") as f:
+                dolu = sum(1 for satir in f if satir.strip())
+        degisen = {}
+        for kayit in kayitlar:
+            if yol is None or dolu >= ARSIV_SEGMENT_BOYUTU:
+                sira = int(os.path.basename(yol)[:-6]) + 1 if yol else 0
+                os.makedirs(arsiv, exist_ok=True)
+                yol, dolu = f"{arsiv}/{sira:06d}.jsonl", 0
+            with open(yol, "a") as f:
+                f.write(json.dumps(kayit) + "\n")
+            dolu += 1
+            degisen[yol] = True
+        for yol in degisen:
+            with open(yol, "r") as f:
+                degisen[yol] = f.read()
+        senkron_kuyruguna_ekle(degisen)
+    except Exception as e:
+        st.error(f"Sistem Hatası: {str(e)}")
+
+
+def arsiv_gecisi(arsiv):
+    # Eski tek parça {arsiv}.json dosyasını bir kereye mahsus segmentlere böler
+    eski = f"{arsiv}.json"
+    if not os.path.exists(eski) or arsiv_segmentleri(arsiv):
+        return
+    try:
+        with open(eski, "r") as f:
+            kayitlar = json.load(f)
+    except:
+        return
+    gecerli = []
+    for kayit in kayitlar:
+        try:
+            gecerli.append(arsiv_kaydi_dogrula(kayit))
+        except ValueError:
+            continue
+    kayitlar = gecerli
+    os.makedirs(arsiv, exist_ok=True)
+    dosyalar = {}
+    for i in range(0, len(kayitlar), ARSIV_SEGMENT_BOYUTU):
+        yol = f"{arsiv}/{i // ARSIV_SEGMENT_BOYUTU:06d}.jsonl"
+        icerik = "".join(
+            json.dumps(k) + "\n" for k in kayitlar[i : i + ARSIV_SEGMENT_BOYUTU]
+        )
+        with open(yol, "w") as f:
+            f.write(icerik)
+        dosyalar[yol] = icerik
+    os.remove(eski)
+    dosyalar[eski] = None
+    senkron_kuyruguna_ekle(dosyalar)
+
+
+# --- SQLITE DEPOSU (İSTEĞE BAĞLI) ---
+# FINANS_DEPO=sqlite (Secrets ya da ortam değişkeni) ile açılır. Okumalar SQLite'tan yapılır;
+# yazımlar tek işlemde SQLite'a gider ve GitHub senkronu için JSON düzeninde de dışa aktarılır.
+SQLITE_DOSYASI = "finans.sqlite3"
+SQLITE_BELGELERI = {"varliklarim.json", "fiyat_gecmis.json", "butce.json"}
+SQLITE_SEMASI = """
+CREATE TABLE IF NOT EXISTS varliklar (
+    kategori TEXT NOT NULL,
+    vid TEXT NOT NULL,
+    miktar REAL NOT NULL,
+    maliyet_usd REAL NOT NULL,
+    PRIMARY KEY (kategori, vid)
+);
+CREATE INDEX IF NOT EXISTS varliklar_vid ON varliklar (vid);
+CREATE TABLE IF NOT EXISTS fiyat_gecmis (
+    varlik TEXT NOT NULL,
+    para TEXT NOT NULL,
+    deger REAL NOT NULL,
+    PRIMARY KEY (varlik, para)
+);
+CREATE TABLE IF NOT EXISTS portfoy_anlik (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tarih TEXT NOT NULL,
+    kripto_tl REAL, nakit_tl REAL, borsa_tl REAL, toplam_tl REAL,
+    kripto_usd REAL, nakit_usd REAL, borsa_usd REAL, toplam_usd REAL
+);
+CREATE INDEX IF NOT EXISTS portfoy_anlik_tarih ON portfoy_anlik (tarih);
+CREATE TABLE IF NOT EXISTS butce_arsiv (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tarih TEXT NOT NULL,
+    veri TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS butce_arsiv_tarih ON butce_arsiv (tarih);
+CREATE TABLE IF NOT EXISTS belgeler (ad TEXT PRIMARY KEY, icerik TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS ice_aktarimlar (ad TEXT PRIMARY KEY);
+"""
+SQLITE_ARSIV_TABLOLARI = {"gecmis_arsiv": "portfoy_anlik", "butce_arsiv": "butce_arsiv"}
+
+
+def depo_turu():
+    try:
+        tur = st.secrets.get("FINANS_DEPO", "")
+    except:
+        tur = ""
+    return str(tur or os.getenv("FINANS_DEPO", "json")).lower()
+
+
+@st.cache_resource
+def sqlite_deposu(yol):
+    baglanti = sqlite3.connect(yol, check_same_thread=False, timeout=10)
+    baglanti.execute("PRAGMA journal_mode=WAL")
+    baglanti.execute("PRAGMA synchronous=NORMAL")
+    baglanti.executescript(SQLITE_SEMASI)
+    return {"baglanti": baglanti, "kilit": threading.Lock()}
+
+
+SQLITE_DEPOSU = sqlite_deposu(SQLITE_DOSYASI) if depo_turu() == "sqlite" else None
+
+
+def sqlite_sorgu(sql, parametreler=()):
+    with SQLITE_DEPOSU["kilit"]:
+        return SQLITE_DEPOSU["baglanti"].execute(sql, parametreler).fetchall()
+
+
+def sqlite_ice_aktarildi_mi(baglanti, ad):
+    return (
+        baglanti.execute("SELECT 1 FROM ice_aktarimlar WHERE ad = ?", (ad,)).fetchone()
+        is not None
+    )
+
+
+def sqlite_belge_yaz_islem(baglanti, dosya_adi, veri):
+    # Çağıran açık bir işlemin içinde olmalı
+    if dosya_adi == "varliklarim.json":
+        baglanti.execute("DELETE FROM varliklar")
+        baglanti.executemany(
+            "INSERT INTO varliklar (kategori, vid, miktar, maliyet_usd) VALUES (?, ?, ?, ?)",
+            [
+                (kat, vid, k["miktar"], k["maliyet_usd"])
+                for kat, varliklar in veri.items()
+                if kat != "_sema"
+                for vid, k in varliklar.items()
+            ],
+        )
+        baglanti.execute(
+            "INSERT OR REPLACE INTO belgeler (ad, icerik) VALUES (?, ?)",
+            ("varliklarim.json:kategoriler", json.dumps([k for k in veri if k != "_sema"])),
+        )
+    elif dosya_adi == "fiyat_gecmis.json":
+        baglanti.execute("DELETE FROM fiyat_gecmis")
+        # "BTC_tl" gibi anahtarlar varlık ve para birimi kolonlarına ayrılır
+        satirlar = []
+        for anahtar, deger in veri.items():
+            varlik, _, para = anahtar.rpartition("_")
+            if not varlik:
+                varlik, para = anahtar, ""
+            satirlar.append((varlik, para, float(deger)))
+        baglanti.executemany(
+            "INSERT INTO fiyat_gecmis (varlik, para, deger) VALUES (?, ?, ?)", satirlar
+        )
+    else:
+        baglanti.execute(
+            "INSERT OR REPLACE INTO belgeler (ad, icerik) VALUES (?, ?)",
+            (dosya_adi, json.dumps(veri)),
+        )
+    baglanti.execute("INSERT OR IGNORE INTO ice_aktarimlar (ad) VALUES (?)", (dosya_adi,))
+
+
+def sqlite_belgeleri_yaz(dosyalar):
+    with SQLITE_DEPOSU["kilit"]:
+        baglanti = SQLITE_DEPOSU["baglanti"]
+        with baglanti:
+            for dosya_adi, veri in dosyalar.items():
+                if dosya_adi in SQLITE_BELGELERI and veri is not None:
+                    sqlite_belge_yaz_islem(baglanti, dosya_adi, veri)
+
+
+def sqlite_belge_oku(dosya_adi, varsayilan):
+    with SQLITE_DEPOSU["kilit"]:
+        aktarildi = sqlite_ice_aktarildi_mi(SQLITE_DEPOSU["baglanti"], dosya_adi)
+    if not aktarildi:
+        # İlk kullanımda mevcut JSON dosyası (şema geçişleri uygulanmış haliyle) içeri alınır
+        veri = json_veri_yukle(dosya_adi, varsayilan)
+        sqlite_belgeleri_yaz({dosya_adi: veri})
+        return veri
+    if dosya_adi == "varliklarim.json":
+        kategoriler = sqlite_sorgu(
+            "SELECT icerik FROM belgeler WHERE ad = ?", ("varliklarim.json:kategoriler",)
+        )
+        veri = {k: {} for k in (json.loads(kategoriler[0][0]) if kategoriler else varsayilan)}
+        for kat, vid, miktar, maliyet in sqlite_sorgu(
+            "SELECT kategori, vid, miktar, maliyet_usd FROM varliklar"
+        ):
+            veri.setdefault(kat, {})[vid] = {"miktar": miktar, "maliyet_usd": maliyet}
+        return veri
+    if dosya_adi == "fiyat_gecmis.json":
+        return {
+            (f"{varlik}_{para}" if para else varlik): deger
+            for varlik, para, deger in sqlite_sorgu(
+                "SELECT varlik, para, deger FROM fiyat_gecmis"
+            )
+        }
+    satir = sqlite_sorgu("SELECT icerik FROM belgeler WHERE ad = ?", (dosya_adi,))
+    if not satir:
+        return varsayilan
+    veri = json.loads(satir[0][0])
+    if isinstance(veri, dict):
+        veri.pop("_sema", None)
+    return veri
+
+
+def sqlite_arsiv_satiri(arsiv, kayit):
+    if arsiv == "gecmis_arsiv":
+        return (
+            "INSERT INTO portfoy_anlik (tarih, "
+            + ", ".join(PORTFOY_ALANLARI)
+            + ") VALUES (?"
+            + ", ?" * len(PORTFOY_ALANLARI)
+            + ")",
+            (kayit["tarih"],) + tuple(kayit.get(a) for a in PORTFOY_ALANLARI),
+        )
+    return (
+        "INSERT INTO butce_arsiv (tarih, veri) VALUES (?, ?)",
+        (kayit["tarih"], json.dumps(kayit)),
+    )
+
+
+def sqlite_arsiv_ice_aktar(arsiv):
+    # Çağıran SQLite kilidini tutuyor olmalı
+    baglanti = SQLITE_DEPOSU["baglanti"]
+    if sqlite_ice_aktarildi_mi(baglanti, arsiv):
+        return
+    with baglanti:
+        for yol in arsiv_segmentleri(arsiv):
+            durum = os.stat(yol)
+            for kayit in arsiv_segmenti_oku(yol, durum.st_mtime_ns, durum.st_size):
+                if arsiv == "gecmis_arsiv":
+                    kayit = portfoy_kaydi_sayisallastir(kayit)
+                baglanti.execute(*sqlite_arsiv_satiri(arsiv, kayit))
+        baglanti.execute("INSERT INTO ice_aktarimlar (ad) VALUES (?)", (arsiv,))
+
+
+def sqlite_arsive_ekle(arsiv, kayitlar):
+    with SQLITE_DEPOSU["kilit"]:
+        sqlite_arsiv_ice_aktar(arsiv)
+        baglanti = SQLITE_DEPOSU["baglanti"]
+        with baglanti:
+            for kayit in kayitlar:
+                baglanti.execute(*sqlite_arsiv_satiri(arsiv, kayit))
+
+
+def sqlite_tarih_kosulu(baslangic, bitis):
+    kosullar, parametreler = [], []
+    if baslangic:
+        kosullar.append("tarih >= ?")
+        parametreler.append(baslangic)
+    if bitis:
+        kosullar.append("tarih <= ?")
+        parametreler.append(bitis)
+    return (" WHERE " + " AND ".join(kosullar) if kosullar else ""), parametreler
+
+
+def sqlite_arsiv_satirlari(arsiv, kolonlar, baslangic=None, bitis=None, ters=False):
+    with SQLITE_DEPOSU["kilit"]:
+        sqlite_arsiv_ice_aktar(arsiv)
+    kosul, parametreler = sqlite_tarih_kosulu(baslangic, bitis)
+    yon = "DESC" if ters else "ASC"
+    return sqlite_sorgu(
+        f"SELECT {kolonlar} FROM {SQLITE_ARSIV_TABLOLARI[arsiv]}{kosul} "
+        f"ORDER BY tarih {yon}, id {yon}",
+        parametreler,
+    )
+
+
+def sqlite_arsiv_oku(arsiv, baslangic=None, bitis=None):
+    if arsiv == "gecmis_arsiv":
+        alanlar = ("tarih",) + tuple(PORTFOY_ALANLARI)
+        for satir in sqlite_arsiv_satirlari(arsiv, ", ".join(alanlar), baslangic, bitis):
+            yield dict(zip(alanlar, satir))
+    else:
+        for (veri,) in sqlite_arsiv_satirlari(arsiv, "veri", baslangic, bitis):
+            yield json.loads(veri)
+
+
+def sqlite_son_arsiv_kaydi(arsiv):
+    with SQLITE_DEPOSU["kilit"]:
+        sqlite_arsiv_ice_aktar(arsiv)
+    tablo = SQLITE_ARSIV_TABLOLARI[arsiv]
+    satir = sqlite_sorgu(f"SELECT id FROM {tablo} ORDER BY tarih DESC, id DESC LIMIT 1")
+    if not satir:
+        return None
+    if arsiv == "gecmis_arsiv":
+        alanlar = ("tarih",) + tuple(PORTFOY_ALANLARI)
+        s = sqlite_sorgu(f"SELECT {', '.join(alanlar)} FROM {tablo} WHERE id = ?", satir[0])
+        return dict(zip(alanlar, s[0]))
+    return json.loads(sqlite_sorgu(f"SELECT veri FROM {tablo} WHERE id = ?", satir[0])[0][0])
+
+
+def sqlite_arsiv_tarih_sinirlari(arsiv):
+    with SQLITE_DEPOSU["kilit"]:
+        sqlite_arsiv_ice_aktar(arsiv)
+    return tuple(
+        sqlite_sorgu(f"SELECT MIN(tarih), MAX(tarih) FROM {SQLITE_ARSIV_TABLOLARI[arsiv]}")[0]
+    )
 
 
 # Sayfa Ayarları
@@ -240,6 +903,12 @@ st.markdown(
     table.yf-table tr:hover td {
         background: #12233b;
     }
+    table.yf-table .spk {
+        display: block;
+        width: 92px;
+        height: 24px;
+        background-repeat: no-repeat;
+    }
     </style>
     """,
     unsafe_allow_html=True,
@@ -288,9 +957,8 @@ veriler = veri_yukle(
     "varliklarim.json", {"hisseler": {}, "kripto_paralar": {}, "nakit_ve_emtia": {}}
 )
 gecmis_fiyatlar = veri_yukle("fiyat_gecmis.json", {})
-gecmis_kayitlar = [
-    k for k in veri_yukle("gecmis_arsiv.json", []) if "nan" not in str(k)
-]
+arsiv_gecisi("gecmis_arsiv")
+arsiv_gecisi("butce_arsiv")
 butce_verisi = veri_yukle(
     "butce.json",
     {
@@ -299,20 +967,19 @@ butce_verisi = veri_yukle(
         "aylik_sabit_gider_bilgi": {},
     },
 )
-butce_arsivi = [b for b in veri_yukle("butce_arsiv.json", []) if "nan" not in str(b)]
 
 
 # --- YARDIMCI FONKSİYONLAR ---
-def temizle_sayi(v):
-    if isinstance(v, str):
-        return float(
-            v.replace("₺", "")
-            .replace("$", "")
-            .replace(",", "")
-            .replace("%", "")
-            .strip()
-        )
-    return float(v)
+def ayar_oku(anahtar, varsayilan):
+    # Streamlit Secrets'tan "BOLUM.alt" biçimindeki anahtarı varsayılanın tipinde okur;
+    # secrets yoksa, anahtar yoksa ya da değer çevrilemezse varsayılan döner
+    try:
+        deger = st.secrets
+        for parca in anahtar.split("."):
+            deger = deger[parca]
+        return type(varsayilan)(deger)
+    except:
+        return varsayilan
 
 
 def fmt_yuzde(suan, eski):
@@ -335,11 +1002,30 @@ def renk_stili(val):
     return ""
 
 
-@st.cache_data(ttl=3600, show_spinner=False)
-def gunluk_haber_maddeleri(sorgu):
+def rss_maddeleri(akis, adet):
+    # RSS akış halinde ayrıştırılır; adet kadar <item> toplanınca yanıtın kalanı okunmaz
+    maddeler = []
+    try:
+        for _, eleman in ET.iterparse(akis, events=("end",)):
+            if eleman.tag != "item":
+                continue
+            maddeler.append(
+                {alan: (eleman.findtext(alan) or "").strip() for alan in ("title", "source", "pubDate")}
+            )
+            eleman.clear()
+            if len(maddeler) >= adet:
+                break
+    except ET.ParseError:
+        pass
+    return maddeler
+
+
+def gunluk_haber_maddeleri(sorgu, adet=2):
     try:
-        res = requests.get(
+        res = http_istek(
+            "GET",
             "https://news.google.com/rss/search",
+            "google_news",
             params={
                 "q": f"{sorgu} when:1d",
                 "hl": "tr",
@@ -347,251 +1033,1645 @@ def gunluk_haber_maddeleri(sorgu):
                 "ceid": "TR:tr",
             },
             timeout=6,
+            stream=True,
         )
-        soup = BeautifulSoup(res.content, "html.parser")
+        try:
+            if res.status_code != 200:
+                return None
+            res.raw.decode_content = True
+            maddeler = rss_maddeleri(res.raw, adet)
+        finally:
+            res.close()
         items = []
-        for item in soup.find_all("item")[:2]:
-            baslik = item.title.text.strip() if item.title else ""
-            kaynak = item.source.text.strip() if item.source else "Haber"
-            tarih_raw = item.pubDate.text.strip() if item.pubDate else ""
+        for m in maddeler:
             saat = ""
-            if tarih_raw:
+            if m["pubDate"]:
                 try:
-                    dt = parsedate_to_datetime(tarih_raw).astimezone()
+                    dt = parsedate_to_datetime(m["pubDate"]).astimezone()
                     saat = dt.strftime("%d.%m %H:%M")
                 except:
                     saat = ""
-            if baslik:
-                items.append({"baslik": baslik, "kaynak": kaynak, "saat": saat})
+            if m["title"]:
+                items.append(
+                    {"baslik": m["title"], "kaynak": m["source"] or "Haber", "saat": saat}
+                )
         return items
     except:
-        return []
+        # Hata ile "haber yok" ayrılsın diye None döner
+        return None
 
 
-def varlik_haber_sorgusu(vid, tip):
-    if tip == "kripto":
-        return f"{vid} kripto"
-    if tip == "hisse":
-        kod = vid.split(".")[0].upper()
-        return f"{kod} BIST hisse" if ".is" in vid.lower() else f"{kod} stock"
-    return {
-        "dolar": "USDTRY döviz kuru",
-        "euro": "EURTRY döviz kuru",
-        "sterlin": "GBPTRY döviz kuru",
-        "gram_altin": "gram altın",
-    }.get(vid.lower(), vid)
+# --- PORTFÖY ANLIK GÖRÜNTÜLERİ (SAYISAL KOLONLAR) ---
+PORTFOY_ALANLARI = {
+    "kripto_tl": "Kripto (TL)",
+    "nakit_tl": "Nakit (TL)",
+    "borsa_tl": "Borsa (TL)",
+    "toplam_tl": "Toplam (TL)",
+    "kripto_usd": "Kripto ($)",
+    "nakit_usd": "Nakit ($)",
+    "borsa_usd": "Borsa ($)",
+    "toplam_usd": "Toplam ($)",
+}
 
 
-def degisim_tooltip_olustur(vid, tip, deg_usd):
-    yon = "yükseliş" if deg_usd >= 0 else "düşüş"
-    sorgu = varlik_haber_sorgusu(vid, tip)
-    haberler = gunluk_haber_maddeleri(sorgu)
-    cumleler = [f"Son 24 saatte {vid.upper()} %{deg_usd:+.2f} ({yon}) hareket etti."]
+def portfoy_kaydi_sayisallastir(kayit):
+    if "toplam_tl" in kayit:
+        return kayit
+    yeni = {"tarih": kayit["tarih"]}
+    for alan, eski_ad in PORTFOY_ALANLARI.items():
+        yeni[alan] = temizle_sayi(kayit.get(eski_ad, 0))
+    return yeni
 
-    # Yahoo Finance: günlük + saatlik bağlam
-    yf_symbol = None
-    if tip == "hisse":
-        yf_symbol = vid.upper()
-    elif tip == "kripto":
-        kmap = {
-            "bitcoin": "BTC-USD",
-            "ethereum": "ETH-USD",
-            "solana": "SOL-USD",
-            "ripple": "XRP-USD",
-            "avalanche-2": "AVAX-USD",
-            "optimism": "OP-USD",
-            "arbitrum": "ARB-USD",
-            "zksync": "ZK-USD",
-            "eigenlayer": "EIGEN-USD",
-        }
-        yf_symbol = kmap.get(vid.lower())
-    elif tip == "nakit":
-        yf_symbol = {
-            "dolar": "USDTRY=X",
-            "euro": "EURTRY=X",
-            "sterlin": "GBPTRY=X",
-            "gram_altin": "XAUUSD=X",
-        }.get(vid.lower())
-
-    if yf_symbol:
-        try:
-            hist = yf.Ticker(yf_symbol).history(period="2d", interval="60m")
-            if len(hist) > 2:
-                son = float(hist["Close"].iloc[-1])
-                onceki_saat = float(hist["Close"].iloc[-2])
-                onceki_gun = float(hist["Close"].iloc[0])
-                saatlik = ((son - onceki_saat) / onceki_saat * 100) if onceki_saat else 0.0
-                gunluk = ((son - onceki_gun) / onceki_gun * 100) if onceki_gun else 0.0
-                cumleler.append(
-                    f"Yahoo Finance verisine göre saatlik %{saatlik:+.2f}, günlük %{gunluk:+.2f}."
-                )
-        except:
-            pass
 
-    # GLDTR / GMSTR için emtia endeks yorumu
-    vid_upper = vid.upper()
-    if vid_upper == "GLDTR.IS":
-        try:
-            emtia = yf.Ticker("XAUUSD=X").history(period="2d", interval="60m")
-            if len(emtia) > 2:
-                e_son = float(emtia["Close"].iloc[-1])
-                e_gun = float(emtia["Close"].iloc[0])
-                e_deg = ((e_son - e_gun) / e_gun * 100) if e_gun else 0.0
-                cumleler.append(
-                    f"GLDTR altın fiyatına endeksli; spot altında günlük %{e_deg:+.2f} hareket izlendi."
-                )
-        except:
-            pass
-    elif vid_upper == "GMSTR.IS":
-        try:
-            emtia = yf.Ticker("XAGUSD=X").history(period="2d", interval="60m")
-            if len(emtia) > 2:
-                e_son = float(emtia["Close"].iloc[-1])
-                e_gun = float(emtia["Close"].iloc[0])
-                e_deg = ((e_son - e_gun) / e_gun * 100) if e_gun else 0.0
-                cumleler.append(
-                    f"GMSTR gümüş fiyatına endeksli; spot gümüşte günlük %{e_deg:+.2f} hareket izlendi."
-                )
-        except:
-            pass
+@st.cache_resource
+def portfoy_gecisi_durumu():
+    # Geçiş süreç başına bir kez denetlenir; sonraki çalıştırmalar segmentlere dokunmaz
+    return {"tamam": False, "kilit": threading.Lock()}
 
-    if not haberler:
-        cumleler.append("Google News/TradingView tarafında belirgin yeni başlık yakalanamadı.")
-        return " ".join(cumleler[:3])
 
-    for h in haberler[:2]:
-        zaman = f" ({h['saat']})" if h["saat"] else ""
-        cumleler.append(f"{h['kaynak']}{zaman}: {h['baslik']}")
-    return " ".join(cumleler[:3])
+PORTFOY_GECISI = portfoy_gecisi_durumu()
 
 
-def varlik_yf_sembol(vid, tip):
-    if tip == "hisse":
-        return vid.upper()
-    if tip == "kripto":
-        kmap = {
-            "bitcoin": "BTC-USD",
-            "ethereum": "ETH-USD",
-            "solana": "SOL-USD",
-            "ripple": "XRP-USD",
-            "avalanche-2": "AVAX-USD",
-            "optimism": "OP-USD",
-            "arbitrum": "ARB-USD",
-            "zksync": "ZK-USD",
-            "eigenlayer": "EIGEN-USD",
-        }
-        return kmap.get(vid.lower())
-    if tip == "nakit":
-        return {
-            "dolar": "USDTRY=X",
-            "euro": "EURTRY=X",
-            "sterlin": "GBPTRY=X",
-            "gram_altin": "XAUUSD=X",
-        }.get(vid.lower())
+def segment_ilk_kaydi(yol):
+    try:
+        with open(yol, "r") as f:
+            for satir in f:
+                if satir.strip():
+                    return json.loads(satir)
+    except:
+        pass
     return None
 
 
-@st.cache_data(ttl=1200, show_spinner=False)
-def mini_sparkline_data(yf_symbol):
-    if not yf_symbol:
-        return []
+def portfoy_arsivi_gecisi():
+    # Biçimli metin ("₺951,102") tutan eski segmentler bir kez sayısal kayıtlara çevrilir.
+    # Segmentin biçimi yalnızca ilk satırından anlaşılır; tamamı sadece çevrilecekse okunur.
+    durum = PORTFOY_GECISI
+    with durum["kilit"]:
+        if durum["tamam"]:
+            return
+        dosyalar = {}
+        for yol in arsiv_segmentleri("gecmis_arsiv"):
+            ilk = segment_ilk_kaydi(yol)
+            if ilk is None or "toplam_tl" in ilk:
+                continue
+            dosya = os.stat(yol)
+            kayitlar = arsiv_segmenti_oku(yol, dosya.st_mtime_ns, dosya.st_size)
+            icerik = "".join(
+                json.dumps(portfoy_kaydi_sayisallastir(k)) + "\n" for k in kayitlar
+            )
+            with open(yol, "w") as f:
+                f.write(icerik)
+            dosyalar[yol] = icerik
+        if dosyalar:
+            senkron_kuyruguna_ekle(dosyalar)
+        durum["tamam"] = True
+
+
+def arsiv_imzasi(arsiv):
+    imza = []
+    for yol in arsiv_segmentleri(arsiv):
+        durum = os.stat(yol)
+        imza.append((yol, durum.st_mtime_ns, durum.st_size))
+    return tuple(imza)
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def portfoy_kolonlari_oku(imza):
+    # Her ekleme imzayı değiştirir; eski arşiv kolonları birikmesin diye yalnızca son iki sürüm tutulur
+    kayitlar = [k for yol, m, b in imza for k in arsiv_segmenti_oku(yol, m, b)]
+    # Geriye dönük doldurulan günler sona eklendiği için kayıtlar tarihe göre sıralanır
+    kayitlar.sort(key=lambda k: k["tarih"])
+    kolonlar = {"tarih": pd.to_datetime([k["tarih"] for k in kayitlar]).to_numpy()}
+    for alan in PORTFOY_ALANLARI:
+        kolonlar[alan] = np.fromiter(
+            (k.get(alan, np.nan) for k in kayitlar), dtype=float, count=len(kayitlar)
+        )
+    return kolonlar
+
+
+def portfoy_kolonlari(baslangic=None, bitis=None):
+    # {"tarih": datetime64 dizisi, "toplam_tl": float64 dizisi, ...}; tarih aralığı dahildir
+    if SQLITE_DEPOSU:
+        satirlar = sqlite_arsiv_satirlari(
+            "gecmis_arsiv", "tarih, " + ", ".join(PORTFOY_ALANLARI), baslangic, bitis
+        )
+        kolonlar = {"tarih": pd.to_datetime([s[0] for s in satirlar]).to_numpy()}
+        for i, alan in enumerate(PORTFOY_ALANLARI, start=1):
+            kolonlar[alan] = np.array(
+                [np.nan if s[i] is None else s[i] for s in satirlar], dtype=float
+            )
+        return kolonlar
+    kolonlar = portfoy_kolonlari_oku(arsiv_imzasi("gecmis_arsiv"))
+    if baslangic is None and bitis is None:
+        return kolonlar
+    maske = np.ones(len(kolonlar["tarih"]), dtype=bool)
+    if baslangic:
+        maske &= kolonlar["tarih"] >= np.datetime64(pd.Timestamp(baslangic))
+    if bitis:
+        maske &= kolonlar["tarih"] <= np.datetime64(pd.Timestamp(bitis))
+    return {k: v[maske] for k, v in kolonlar.items()}
+
+
+def ardisik_degisim(x):
+    onceki = np.concatenate(([0.0], x[:-1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(np.abs(onceki) > 0, (x - onceki) / np.abs(onceki) * 100, 0.0)
+
+
+portfoy_arsivi_gecisi()
+
+# --- FİYAT ZAMAN SERİSİ DEPOSU ---
+# Her varlık/para çifti ("bitcoin_usd") bir kolon; satırlar zaman damgası (epoch sn).
+# Veri yaşlandıkça seyreltilir: son 2 gün tüm noktalar, 90 güne kadar gün sonu, sonrası hafta sonu.
+FIYAT_SERISI_DOSYASI = "fiyat_serisi.json"
+FIYAT_SERISI_ARALIGI = 900
+SERI_GUNLUK_ESIK = 2 * 86400
+SERI_HAFTALIK_ESIK = 90 * 86400
+DEGISIM_REFERANSLARI = {
+    "Son Kapanış": None,
+    "1 Gün": 86400,
+    "1 Hafta": 7 * 86400,
+    "1 Ay": 30 * 86400,
+    "3 Ay": 90 * 86400,
+    "1 Yıl": 365 * 86400,
+}
+
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def fiyat_serisi_dizileri(mtime_ns, boyut):
+    # Ham JSON ayrıca önbelleğe alınmaz; yalnızca güncel (ve bir önceki) matris tutulur
     try:
-        hist = yf.Ticker(yf_symbol).history(period="2d", interval="60m")
-        if hist.empty:
-            return []
-        vals = [float(v) for v in hist["Close"].dropna().tolist()]
-        return vals[-24:] if len(vals) > 24 else vals
+        with open(FIYAT_SERISI_DOSYASI, "r") as f:
+            ham = json.load(f)
     except:
-        return []
+        ham = {}
+    kolonlar = list(ham.get("seriler", {}))
+    zaman = np.array(ham.get("zaman", []), dtype=np.int64)
+    matris = np.full((len(zaman), len(kolonlar)), np.nan)
+    for j, kolon in enumerate(kolonlar):
+        matris[:, j] = [np.nan if v is None else v for v in ham["seriler"][kolon]]
+    return {"zaman": zaman, "kolonlar": kolonlar, "matris": matris}
 
 
-def sparkline_svg(yf_symbol):
-    vals = mini_sparkline_data(yf_symbol)
-    if len(vals) < 2:
-        return ""
-    w, h = 92, 24
-    vmin, vmax = min(vals), max(vals)
-    rng = (vmax - vmin) if vmax != vmin else 1.0
-    n = len(vals) - 1
-    points = []
-    for i, v in enumerate(vals):
-        x = i * (w / n)
-        y = h - ((v - vmin) / rng) * (h - 2) - 1
-        points.append(f"{x:.2f},{y:.2f}")
-    up = vals[-1] >= vals[0]
-    color = "#00d084" if up else "#ff5f6d"
-    fill = "rgba(0,208,132,0.14)" if up else "rgba(255,95,109,0.14)"
-    polyline = " ".join(points)
-    area = f"0,{h} {polyline} {w},{h}"
-    svg = (
-        f"<svg xmlns='http://www.w3.org/2000/svg' width='{w}' height='{h}' viewBox='0 0 {w} {h}'>"
-        f"<polyline points='{area}' fill='{fill}' stroke='none'/>"
-        f"<polyline points='{polyline}' fill='none' stroke='{color}' stroke-width='1.8'/>"
-        f"<circle cx='{points[-1].split(',')[0]}' cy='{points[-1].split(',')[1]}' r='2.4' fill='{color}'/>"
-        f"</svg>"
+def fiyat_serisi():
+    try:
+        durum = os.stat(FIYAT_SERISI_DOSYASI)
+        seri = fiyat_serisi_dizileri(durum.st_mtime_ns, durum.st_size)
+    except OSError:
+        seri = fiyat_serisi_dizileri(0, 0)
+    seri["sira"] = {k: j for j, k in enumerate(seri["kolonlar"])}
+    return seri
+
+
+def seri_seyrelt(zaman, matris, simdi):
+    # Aynı kademe/kovadaki satırlar tek satıra iner; her kolon için kovadaki son dolu değer kalır
+    if len(zaman) == 0:
+        return zaman, matris
+    yas = simdi - zaman
+    gun = (zaman + time.localtime().tm_gmtoff) // 86400
+    kademe = np.select([yas < SERI_GUNLUK_ESIK, yas < SERI_HAFTALIK_ESIK], [0, 1], 2)
+    kova = np.select([kademe == 0, kademe == 1], [zaman, gun], (gun + 3) // 7)
+    df = pd.DataFrame(matris)
+    df["_zaman"] = zaman
+    ozet = df.groupby([kademe, kova], sort=False).last()
+    ozet = ozet.sort_values("_zaman")
+    return ozet.pop("_zaman").to_numpy(np.int64), ozet.to_numpy(float)
+
+
+def fiyat_serisine_ekle(fiyatlar, zorla=False):
+    # fiyatlar: {"bitcoin_usd": 71127.0, ...}; aralık dolmadıysa (zorla değilse) yazılmaz.
+    # Gün içi noktalar yalnızca yerel dosyaya yazılır; GitHub'a GÜNÜ KAPAT'ta (zorla) tek seferde gider.
+    fiyatlar = {k: float(v) for k, v in fiyatlar.items() if v and np.isfinite(v) and v > 0}
+    if not fiyatlar:
+        return
+    seri = fiyat_serisi()
+    simdi = int(time.time())
+    if not zorla and len(seri["zaman"]) and simdi - seri["zaman"][-1] < FIYAT_SERISI_ARALIGI:
+        return
+    kolonlar = seri["kolonlar"] + [k for k in fiyatlar if k not in seri["sira"]]
+    matris = np.full((len(seri["zaman"]) + 1, len(kolonlar)), np.nan)
+    matris[:-1, : len(seri["kolonlar"])] = seri["matris"]
+    matris[-1] = [fiyatlar.get(k, np.nan) for k in kolonlar]
+    zaman, matris = seri_seyrelt(np.append(seri["zaman"], simdi), matris, simdi)
+    icerik = json.dumps(
+        {
+            "zaman": zaman.tolist(),
+            "seriler": {
+                k: [None if np.isnan(v) else round(v, 6) for v in matris[:, j]]
+                for j, k in enumerate(kolonlar)
+            },
+        },
+        separators=(",", ":"),
     )
-    return f"data:image/svg+xml;utf8,{urllib.parse.quote(svg)}"
+    with open(FIYAT_SERISI_DOSYASI, "w") as f:
+        f.write(icerik)
+    if zorla:
+        senkron_kuyruguna_ekle({FIYAT_SERISI_DOSYASI: icerik})
+
+
+def fiyat_asof(seri, anahtar, zaman):
+    # zaman anındaki (ya da öncesindeki en yakın) dolu değer; yoksa None
+    j = seri["sira"].get(anahtar)
+    if j is None:
+        return None
+    i = np.searchsorted(seri["zaman"], zaman, side="right")
+    degerler = seri["matris"][:i, j]
+    dolu = np.flatnonzero(~np.isnan(degerler))
+    return float(degerler[dolu[-1]]) if len(dolu) else None
+
+
+# --- PERFORMANS ANALİTİĞİ ---
+# Birikimli değer değişimi, düşüş ve kategori katkısı anlık görüntü başına; volatilite ve Sharpe
+# günlük seride hesaplanır. Önbellek seriyi önek olarak tanır, yalnızca yeni satırları işler.
+# Anlık görüntülerde para giriş/çıkışı tutulmadığından ölçüler akış düzeltmesizdir: alım ya da
+# miktar artışı da getiri gibi görünür (gerçek zaman ağırlıklı getiri değildir).
+ANALIZ_KATEGORILERI = {"kripto": "Kripto", "nakit": "Nakit", "borsa": "Borsa"}
+ANALIZ_PENCERESI = 30
+YILLIK_GUN = 365
+RISKSIZ_GETIRI = {"tl": 0.0, "usd": 0.0}
+
+
+def risksiz_getiri(para):
+    # Streamlit Secrets'ta [RISKSIZ_GETIRI] bölümüyle (yıllık, 0.45 = %45) ezilebilir
+    return ayar_oku(f"RISKSIZ_GETIRI.{para}", float(RISKSIZ_GETIRI[para]))
+
+
+@st.cache_resource
+def analiz_onbellegi():
+    # Para birimi başına tek durum; farklı bir tarih aralığı öncekinin yerine yazılır
+    return {"durumlar": {}, "kilit": threading.Lock()}
+
+
+ANALIZ_ONBELLEGI = analiz_onbellegi()
+
+
+def birikimli_analiz(toplam, kategoriler, onceki):
+    # onceki aynı serinin işlenmiş öneki ise yalnızca toplam[onceki["n"]:] hesaplanır
+    bas = onceki["n"] if onceki else 0
+    yeni, yeni_kat = toplam[bas:], kategoriler[bas:]
+    ilk_deger = onceki["son_deger"] if onceki else yeni[0]
+    ilk_kat = onceki["son_kat"] if onceki else yeni_kat[0]
+    once = np.concatenate(([ilk_deger], yeni[:-1]))
+    once_kat = np.vstack((ilk_kat, yeni_kat[:-1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        getiri = np.where(once > 0, yeni / once - 1, 0.0)
+        katki = np.where(once[:, None] > 0, (yeni_kat - once_kat) / once[:, None], 0.0)
+    carpim = np.cumprod(1 + getiri) * (onceki["carpim"][-1] if onceki else 1.0)
+    tepe = np.maximum(np.maximum.accumulate(carpim), onceki["tepe"] if onceki else -np.inf)
+    katki = np.cumsum(katki, axis=0) + (onceki["katki"][-1] if onceki else 0.0)
+    if onceki:
+        carpim = np.concatenate((onceki["carpim"], carpim))
+        katki = np.vstack((onceki["katki"], katki))
+        dusus = np.concatenate((onceki["dusus"], carpim[bas:] / tepe - 1))
+    else:
+        dusus = carpim / tepe - 1
+    return {
+        "n": len(toplam),
+        "son_deger": toplam[-1],
+        "son_kat": kategoriler[-1],
+        "carpim": carpim,
+        "tepe": tepe[-1],
+        "dusus": dusus,
+        "katki": katki,
+    }
 
 
-def doviz_cek():
-    try:
-        res = requests.get("https://www.doviz.com/", timeout=5)
-        soup = BeautifulSoup(res.text, "html.parser")
-
-        def t(sid):
-            return float(
-                soup.find("span", {"data-socket-key": sid})
-                .text.strip()
-                .replace(".", "")
-                .replace(",", ".")
-            )
+def performans_analizi(kol, para):
+    # kol: portfoy_kolonlari() çıktısı; para "tl" ya da "usd"
+    toplam = np.nan_to_num(kol[f"toplam_{para}"])
+    kategoriler = np.nan_to_num(
+        np.column_stack([kol[f"{k}_{para}"] for k in ANALIZ_KATEGORILERI])
+    )
+    zaman = kol["tarih"]
+    onbellek = ANALIZ_ONBELLEGI
+    with onbellek["kilit"]:
+        onceki = onbellek["durumlar"].get(para)
+    # Önek değişmediyse (aynı başlangıç, aynı uzunlukta son değer ve zaman) önceki sonuç genişletilir
+    if onceki and not (
+        onceki["n"] <= len(toplam)
+        and zaman[0] == onceki["ilk_zaman"]
+        and zaman[onceki["n"] - 1] == onceki["son_zaman"]
+        and toplam[onceki["n"] - 1] == onceki["son_deger"]
+    ):
+        onceki = None
+    if onceki and onceki["n"] == len(toplam):
+        durum = onceki
+    else:
+        durum = birikimli_analiz(toplam, kategoriler, onceki)
+        durum["ilk_zaman"] = zaman[0]
+        durum["son_zaman"] = zaman[-1]
+        with onbellek["kilit"]:
+            onbellek["durumlar"][para] = durum
+
+    gunluk = pd.DataFrame(
+        {"birikim": durum["carpim"], "dusus": durum["dusus"]},
+        index=pd.DatetimeIndex(zaman),
+    )
+    gunluk = gunluk.resample("D").agg({"birikim": "last", "dusus": "min"}).dropna()
+    getiri = gunluk["birikim"].pct_change()
+    pencere = getiri.rolling(ANALIZ_PENCERESI, min_periods=max(2, ANALIZ_PENCERESI // 3))
+    oynaklik = pencere.std() * np.sqrt(YILLIK_GUN)
+    gunluk["oynaklik"] = oynaklik
+    gunluk["sharpe"] = (pencere.mean() * YILLIK_GUN - risksiz_getiri(para)) / oynaklik
+    return {
+        "degisim": durum["carpim"][-1] - 1,
+        "max_dusus": float(durum["dusus"].min()),
+        "katki": dict(zip(ANALIZ_KATEGORILERI.values(), durum["katki"][-1])),
+        "gunluk": gunluk,
+    }
 
-        return {
-            "USD": t("USD"),
-            "EUR": t("EUR"),
-            "GBP": t("GBP"),
-            "gram-altin": t("gram-altin"),
-        }
-    except:
-        return {"USD": gecmis_fiyatlar.get("USD_tl", 35.0)}
 
+# --- KALICI ÖNBELLEK (DİSK) ---
+# Haber ve saatlik bar sonuçları yeniden başlatmalar ve aynı makinedeki worker süreçleri
+# arasında paylaşılsın diye küçük bir SQLite dosyasında tutulur; değerler JSON'dur.
+KALICI_ONBELLEK_DOSYASI = ".finans_onbellek.sqlite3"
+KALICI_ONBELLEK_SINIRI = 2000
+KALICI_ONBELLEK_OMRU = 86400
 
-def kripto_fiyat_cek(kripto_sozlugu):
-    ids = ",".join(kripto_sozlugu.keys())
-    if not ids:
-        return {}
+
+@st.cache_resource
+def kalici_onbellek(yol):
     try:
-        return requests.get(
-            f"https://api.coingecko.com/api/v3/simple/price?ids={ids}&vs_currencies=usd",
+        baglanti = sqlite3.connect(yol, check_same_thread=False, timeout=5)
+        baglanti.execute("PRAGMA journal_mode=WAL")
+        baglanti.execute("PRAGMA synchronous=NORMAL")
+        baglanti.execute(
+            "CREATE TABLE IF NOT EXISTS onbellek ("
+            "anahtar TEXT PRIMARY KEY, deger TEXT NOT NULL, "
+            "zaman REAL NOT NULL, erisim REAL NOT NULL)"
+        )
+        baglanti.execute("CREATE INDEX IF NOT EXISTS onbellek_erisim ON onbellek (erisim)")
+        baglanti.commit()
+    except sqlite3.Error:
+        return None
+    return {"baglanti": baglanti, "kilit": threading.Lock()}
+
+
+KALICI_ONBELLEK = kalici_onbellek(KALICI_ONBELLEK_DOSYASI)
+
+
+def kalici_oku(anahtar, ttl):
+    # Süresi dolmamış kayıt varsa (değer, yazılma zamanı), yoksa None; okuma LRU sırasını tazeler
+    if not KALICI_ONBELLEK:
+        return None
+    simdi = time.time()
+    try:
+        with KALICI_ONBELLEK["kilit"]:
+            baglanti = KALICI_ONBELLEK["baglanti"]
+            satir = baglanti.execute(
+                "SELECT deger, zaman FROM onbellek WHERE anahtar = ?", (anahtar,)
+            ).fetchone()
+            if not satir or simdi - satir[1] >= ttl:
+                return None
+            with baglanti:
+                baglanti.execute(
+                    "UPDATE onbellek SET erisim = ? WHERE anahtar = ?", (simdi, anahtar)
+                )
+        return json.loads(satir[0]), satir[1]
+    except (sqlite3.Error, ValueError):
+        return None
+
+
+def kalici_yaz(kayitlar):
+    # {anahtar: değer}; yazımdan sonra ömrü dolan ve LRU sınırını aşan kayıtlar budanır
+    if not KALICI_ONBELLEK or not kayitlar:
+        return
+    simdi = time.time()
+    try:
+        with KALICI_ONBELLEK["kilit"], KALICI_ONBELLEK["baglanti"] as baglanti:
+            baglanti.executemany(
+                "INSERT OR REPLACE INTO onbellek (anahtar, deger, zaman, erisim) "
+                "VALUES (?, ?, ?, ?)",
+                [(a, json.dumps(d), simdi, simdi) for a, d in kayitlar.items()],
+            )
+            baglanti.execute(
+                "DELETE FROM onbellek WHERE zaman < ?", (simdi - KALICI_ONBELLEK_OMRU,)
+            )
+            baglanti.execute(
+                "DELETE FROM onbellek WHERE anahtar IN (SELECT anahtar FROM onbellek "
+                "ORDER BY erisim DESC LIMIT -1 OFFSET ?)",
+                (KALICI_ONBELLEK_SINIRI,),
+            )
+    except sqlite3.Error:
+        pass
+
+
+def kalici_on_ek(on_ek):
+    # Sıcak başlangıç için: ön ekle başlayan ömrü dolmamış kayıtlar {kalan_anahtar: (değer, zaman)}
+    if not KALICI_ONBELLEK:
+        return {}
+    try:
+        with KALICI_ONBELLEK["kilit"]:
+            satirlar = KALICI_ONBELLEK["baglanti"].execute(
+                "SELECT anahtar, deger, zaman FROM onbellek "
+                "WHERE substr(anahtar, 1, ?) = ? AND zaman >= ?",
+                (len(on_ek), on_ek, time.time() - KALICI_ONBELLEK_OMRU),
+            ).fetchall()
+        return {a[len(on_ek):]: (json.loads(d), z) for a, d, z in satirlar}
+    except (sqlite3.Error, ValueError):
+        return {}
+
+
+# --- HABER DEPOSU (ARKA PLAN) ---
+HABER_TTL = 3600
+HABER_HATA_TTL = 120
+HABER_ESZAMANLI = 8
+
+
+@st.cache_resource
+def haber_havuzu():
+    return ThreadPoolExecutor(max_workers=HABER_ESZAMANLI, thread_name_prefix="haber")
+
+
+@st.cache_resource
+def haber_deposu():
+    # Sıcak başlangıç: diskteki haberler hemen sunulur, bayat olanlar ilk istekte tazelenir
+    sonuclar = {
+        sorgu: {"haberler": haberler, "zaman": zaman}
+        for sorgu, (haberler, zaman) in kalici_on_ek("haber:").items()
+        if haberler
+    }
+    return {"sonuclar": sonuclar, "bekleyen": set(), "kilit": threading.Lock()}
+
+
+HABER_HAVUZU = haber_havuzu()
+HABER_DEPOSU = haber_deposu()
+
+
+def haber_arkaplan_cek(sorgu):
+    depo = HABER_DEPOSU
+    try:
+        # Başka bir worker süreci taze sonucu diske yazmışsa ağa çıkılmaz
+        # Boş sonuçlar diske yazılmaz; eski sürümlerin yazdığı boş kayıtlar da yok sayılır
+        kayit = kalici_oku("haber:" + sorgu, HABER_TTL)
+        if kayit and kayit[0]:
+            haberler, zaman = kayit
+        else:
+            haberler, zaman = gunluk_haber_maddeleri(sorgu), time.time()
+            if haberler:
+                kalici_yaz({"haber:" + sorgu: haberler})
+            else:
+                haberler = []
+        # Boş ya da başarısız sonuç kısa süre tutulur, sonra yeniden denenir
+        ttl = HABER_TTL if haberler else HABER_HATA_TTL
+        with depo["kilit"]:
+            depo["sonuclar"][sorgu] = {"haberler": haberler, "zaman": zaman, "ttl": ttl}
+    finally:
+        with depo["kilit"]:
+            depo["bekleyen"].discard(sorgu)
+
+
+def haber_toplu_iste(sorgular):
+    # Eksik/bayat sorguların hepsi tek seferde havuza verilir; aynı sorgu bir kez çekilir
+    depo = HABER_DEPOSU
+    simdi = time.time()
+    with depo["kilit"]:
+        for sorgu in dict.fromkeys(sorgular):
+            kayit = depo["sonuclar"].get(sorgu)
+            if kayit and simdi - kayit["zaman"] < kayit.get("ttl", HABER_TTL):
+                continue
+            if sorgu not in depo["bekleyen"]:
+                depo["bekleyen"].add(sorgu)
+                HABER_HAVUZU.submit(haber_arkaplan_cek, sorgu)
+
+
+def portfoy_haber_sorgulari(veriler):
+    return [
+        varlik_haber_sorgusu(vid, tip)
+        for kat, tip, _ in DOLDURMA_KATEGORILERI
+        for vid in veriler[kat]
+    ]
+
+
+def haber_getir(sorgu):
+    # Hazırsa haber listesi, değilse None döner; eksik/bayat sorgu arka planda çekilir
+    haber_toplu_iste([sorgu])
+    with HABER_DEPOSU["kilit"]:
+        kayit = HABER_DEPOSU["sonuclar"].get(sorgu)
+    return kayit["haberler"] if kayit else None
+
+
+def haber_bekleyen_var():
+    depo = HABER_DEPOSU
+    with depo["kilit"]:
+        return bool(depo["bekleyen"])
+
+
+@st.fragment(run_every=2)
+def haber_bekleyici():
+    # Haberler geldiğinde tabloların ipuçları dolsun diye sayfa bir kez daha çizilir
+    if haber_bekleyen_var():
+        st.caption("📰 Haber özetleri yükleniyor…")
+    else:
+        st.rerun()
+
+
+# --- VARLIK KAYIT DEFTERİ ---
+KRIPTO_YF_SEMBOLLERI = {
+    "bitcoin": "BTC-USD",
+    "ethereum": "ETH-USD",
+    "solana": "SOL-USD",
+    "ripple": "XRP-USD",
+    "avalanche-2": "AVAX-USD",
+    "optimism": "OP-USD",
+    "arbitrum": "ARB-USD",
+    "zksync": "ZK-USD",
+    "eigenlayer": "EIGEN-USD",
+}
+NAKIT_TANIMLARI = {
+    "dolar": {"yf": "USDTRY=X", "doviz": "USD", "haber": "USDTRY döviz kuru"},
+    "euro": {"yf": "EURTRY=X", "doviz": "EUR", "haber": "EURTRY döviz kuru"},
+    "sterlin": {"yf": "GBPTRY=X", "doviz": "GBP", "haber": "GBPTRY döviz kuru"},
+    "gram_altin": {"yf": "XAUUSD=X", "doviz": "gram-altin", "haber": "gram altın"},
+}
+EMTIA_SEMBOLLERI = {"GLDTR.IS": "XAUUSD=X", "GMSTR.IS": "XAGUSD=X"}
+KRIPTO_SEMBOL_DOSYASI = "coingecko_semboller.json"
+KESIF_ARALIGI = 600
+KESIF_TEKRAR = 6 * 3600
+
+
+@st.cache_resource
+def varlik_kayit_defteri():
+    kesfedilen, bulunamayan = {}, {}
+    if os.path.exists(KRIPTO_SEMBOL_DOSYASI):
+        try:
+            with open(KRIPTO_SEMBOL_DOSYASI, "r") as f:
+                kesfedilen = json.load(f)
+            bulunamayan = kesfedilen.pop("_bulunamayan", {})
+            # Eski dosyalarda bulunamayan id'ler "" olarak yazılıydı; ilk keşifte yeniden sorulur
+            kesfedilen = {k: v for k, v in kesfedilen.items() if v}
+        except:
+            kesfedilen, bulunamayan = {}, {}
+    return {
+        "kripto_semboller": {**kesfedilen, **KRIPTO_YF_SEMBOLLERI},
+        "bulunamayan": bulunamayan,
+        "kayitlar": {},
+        "son_kesif": 0.0,
+        "kilit": threading.Lock(),
+    }
+
+
+VARLIK_DEFTERI = varlik_kayit_defteri()
+
+
+def varlik_kaydi_olustur(vid, tip):
+    v = vid.lower()
+    if tip == "hisse":
+        kod = vid.split(".")[0].upper()
+        bist = ".is" in v
+        return {
+            "yf": vid.upper(),
+            "coingecko": None,
+            "doviz": None,
+            "para": "TRY" if bist else "USD",
+            "risk": "guvenli" if vid.upper() in EMTIA_SEMBOLLERI else "hisse",
+            "haber": f"{kod} BIST hisse" if bist else f"{kod} stock",
+        }
+    if tip == "kripto":
+        return {
+            "yf": VARLIK_DEFTERI["kripto_semboller"].get(v) or None,
+            "coingecko": vid,
+            "doviz": None,
+            "para": "USD",
+            "risk": "kripto",
+            "haber": f"{vid} kripto",
+        }
+    tanim = NAKIT_TANIMLARI.get(v, {})
+    return {
+        "yf": tanim.get("yf"),
+        "coingecko": None,
+        "doviz": tanim.get("doviz"),
+        "para": "TRY",
+        "risk": "guvenli",
+        "haber": tanim.get("haber", vid),
+    }
+
+
+def varlik_kaydi(vid, tip):
+    defter = VARLIK_DEFTERI
+    anahtar = (tip, vid.lower())
+    with defter["kilit"]:
+        kayit = defter["kayitlar"].get(anahtar)
+        if kayit is None:
+            kayit = varlik_kaydi_olustur(vid, tip)
+            defter["kayitlar"][anahtar] = kayit
+    return kayit
+
+
+def kripto_sembollerini_kesfet(kripto_idler):
+    # Tabloda olmayan CoinGecko id'leri arka planda tek istekte sembole çevrilir; çizim beklemez.
+    # Bulunamayan id'ler KESIF_TEKRAR dolana kadar yeniden sorulmaz.
+    defter = VARLIK_DEFTERI
+    simdi = time.time()
+    with defter["kilit"]:
+        eksik = [
+            i
+            for i in kripto_idler
+            if i.lower() not in defter["kripto_semboller"]
+            and simdi - defter["bulunamayan"].get(i.lower(), 0) >= KESIF_TEKRAR
+        ]
+        if not eksik or simdi - defter["son_kesif"] < KESIF_ARALIGI:
+            return
+        defter["son_kesif"] = simdi
+    FIYAT_HAVUZU.submit(kripto_sembollerini_cek, eksik)
+
+
+def kripto_sembollerini_cek(eksik):
+    defter = VARLIK_DEFTERI
+    try:
+        r = http_istek(
+            "GET",
+            "https://api.coingecko.com/api/v3/coins/markets",
+            "coingecko",
+            params={"vs_currency": "usd", "ids": ",".join(eksik)},
+            timeout=5,
+        )
+        gelen = r.json()
+        if not isinstance(gelen, list):
+            return
+    except:
+        return
+    bulunan = {
+        c["id"]: f"{c['symbol'].upper()}-USD"
+        for c in gelen
+        if isinstance(c, dict) and c.get("id") and c.get("symbol")
+    }
+    simdi = time.time()
+    with defter["kilit"]:
+        for i in eksik:
+            if i in bulunan:
+                defter["kripto_semboller"][i.lower()] = bulunan[i]
+                defter["bulunamayan"].pop(i.lower(), None)
+            else:
+                defter["bulunamayan"][i.lower()] = simdi
+        defter["kayitlar"].clear()
+        diskteki = {
+            k: v
+            for k, v in defter["kripto_semboller"].items()
+            if k not in KRIPTO_YF_SEMBOLLERI
+        }
+        diskteki["_bulunamayan"] = dict(defter["bulunamayan"])
+    try:
+        with open(KRIPTO_SEMBOL_DOSYASI, "w") as f:
+            json.dump(diskteki, f, indent=2)
+    except:
+        pass
+
+
+def varlik_haber_sorgusu(vid, tip):
+    return varlik_kaydi(vid, tip)["haber"]
+
+
+def varlik_yf_sembol(vid, tip):
+    return varlik_kaydi(vid, tip)["yf"]
+
+
+def degisim_tooltip_olustur(vid, tip, deg_usd):
+    yon = "yükseliş" if deg_usd >= 0 else "düşüş"
+    sorgu = varlik_haber_sorgusu(vid, tip)
+    haberler = haber_getir(sorgu)
+    cumleler = [f"Son 24 saatte {vid.upper()} %{deg_usd:+.2f} ({yon}) hareket etti."]
+
+    # Yahoo Finance: günlük + saatlik bağlam
+    yf_symbol = varlik_yf_sembol(vid, tip)
+
+    kapanislar = saatlik_kapanislar(yf_symbol)
+    if len(kapanislar) > 2:
+        son = kapanislar[-1]
+        onceki_saat = kapanislar[-2]
+        onceki_gun = kapanislar[0]
+        saatlik = ((son - onceki_saat) / onceki_saat * 100) if onceki_saat else 0.0
+        gunluk = ((son - onceki_gun) / onceki_gun * 100) if onceki_gun else 0.0
+        cumleler.append(
+            f"Yahoo Finance verisine göre saatlik %{saatlik:+.2f}, günlük %{gunluk:+.2f}."
+        )
+
+    # GLDTR / GMSTR için emtia endeks yorumu
+    emtia_yorumlari = {
+        "GLDTR.IS": "GLDTR altın fiyatına endeksli; spot altında",
+        "GMSTR.IS": "GMSTR gümüş fiyatına endeksli; spot gümüşte",
+    }
+    if vid.upper() in emtia_yorumlari:
+        giris = emtia_yorumlari[vid.upper()]
+        emtia = saatlik_kapanislar(EMTIA_SEMBOLLERI[vid.upper()])
+        if len(emtia) > 2:
+            e_son, e_gun = emtia[-1], emtia[0]
+            e_deg = ((e_son - e_gun) / e_gun * 100) if e_gun else 0.0
+            cumleler.append(f"{giris} günlük %{e_deg:+.2f} hareket izlendi.")
+
+    if haberler is None:
+        cumleler.append("Haber başlıkları yükleniyor…")
+        return " ".join(cumleler[:3])
+    if not haberler:
+        cumleler.append("Google News/TradingView tarafında belirgin yeni başlık yakalanamadı.")
+        return " ".join(cumleler[:3])
+
+    for h in haberler[:2]:
+        zaman = f" ({h['saat']})" if h["saat"] else ""
+        cumleler.append(f"{h['kaynak']}{zaman}: {h['baslik']}")
+    return " ".join(cumleler[:3])
+
+
+# --- SAATLİK BAR DEPOSU ---
+BAR_TTL = 1200
+
+
+@st.cache_data(ttl=BAR_TTL, show_spinner=False)
+def saatlik_bar_deposu(semboller):
+    # Portföydeki tüm sembollerin 60dk barları tek toplu istekle çekilir; diskte taze kaydı
+    # olanlar (yeniden başlatma öncesinden ya da başka bir süreçten) isteğe katılmaz
+    sonuc = {}
+    for s in semboller:
+        kayit = kalici_oku("bar:" + s, BAR_TTL)
+        if kayit and kayit[0]:
+            sonuc[s] = kayit[0]
+    eksikler = tuple(s for s in semboller if s not in sonuc)
+    if eksikler:
+        seriler = yahoo_toplu_kapanis(eksikler, period="2d", interval="60m")
+        yeni = {s: [float(v) for v in seri.tolist()] for s, seri in seriler.items()}
+        kalici_yaz({"bar:" + s: v for s, v in yeni.items() if v})
+        sonuc.update(yeni)
+    return sonuc
+
+
+def portfoy_bar_sembolleri():
+    semboller = set()
+    for kat, tip in [
+        ("hisseler", "hisse"),
+        ("kripto_paralar", "kripto"),
+        ("nakit_ve_emtia", "nakit"),
+    ]:
+        for vid in veriler.get(kat, {}):
+            sembol = varlik_yf_sembol(vid, tip)
+            if sembol:
+                semboller.add(sembol.upper())
+            if vid.upper() in EMTIA_SEMBOLLERI:
+                semboller.add(EMTIA_SEMBOLLERI[vid.upper()])
+    return tuple(sorted(semboller))
+
+
+def saatlik_kapanislar(yf_symbol):
+    if not yf_symbol:
+        return []
+    semboller = portfoy_bar_sembolleri()
+    if yf_symbol.upper() not in semboller:
+        semboller = tuple(sorted(semboller + (yf_symbol.upper(),)))
+    return saatlik_bar_deposu(semboller).get(yf_symbol.upper(), [])
+
+
+def mini_sparkline_data(yf_symbol):
+    vals = saatlik_kapanislar(yf_symbol)
+    return vals[-24:] if len(vals) > 24 else vals
+
+
+# --- SPARKLINE ---
+SPARK_W, SPARK_H = 92, 24
+SPARK_ONBELLEK_SINIRI = 256
+
+
+@st.cache_resource
+def sparkline_onbellegi():
+    return {"svgler": OrderedDict(), "kilit": threading.Lock()}
+
+
+SPARKLINE_ONBELLEGI = sparkline_onbellegi()
+
+
+def sparkline_svg_uret(vals):
+    w, h = SPARK_W, SPARK_H
+    vmin, vmax = vals.min(), vals.max()
+    rng = (vmax - vmin) if vmax != vmin else 1.0
+    xs = np.arange(len(vals)) * (w / (len(vals) - 1))
+    ys = h - ((vals - vmin) / rng) * (h - 2) - 1
+    noktalar = np.char.add(
+        np.char.add(np.char.mod("%.2f", xs), ","), np.char.mod("%.2f", ys)
+    )
+    up = vals[-1] >= vals[0]
+    color = "#00d084" if up else "#ff5f6d"
+    fill = "rgba(0,208,132,0.14)" if up else "rgba(255,95,109,0.14)"
+    polyline = " ".join(noktalar.tolist())
+    area = f"0,{h} {polyline} {w},{h}"
+    svg = (
+        f"<svg xmlns='http://www.w3.org/2000/svg' width='{w}' height='{h}' viewBox='0 0 {w} {h}'>"
+        f"<polyline points='{area}' fill='{fill}' stroke='none'/>"
+        f"<polyline points='{polyline}' fill='none' stroke='{color}' stroke-width='1.8'/>"
+        f"<circle cx='{xs[-1]:.2f}' cy='{ys[-1]:.2f}' r='2.4' fill='{color}'/>"
+        f"</svg>"
+    )
+    return f"data:image/svg+xml;utf8,{urllib.parse.quote(svg)}"
+
+
+def sparkline_svg(yf_symbol):
+    # Dönüş: (veri özeti, data URI). Aynı bar verisi tekrar çizilmez; özet aynı
+    # zamanda tablo içinde tekrar eden grafiklerin CSS sınıfı olarak kullanılır.
+    vals = np.asarray(mini_sparkline_data(yf_symbol), dtype=float)
+    if len(vals) < 2:
+        return "", ""
+    ozet = hashlib.blake2b(vals.tobytes(), digest_size=8).hexdigest()
+    anahtar = (yf_symbol.upper(), ozet)
+    depo = SPARKLINE_ONBELLEGI
+    with depo["kilit"]:
+        uri = depo["svgler"].get(anahtar)
+        if uri is not None:
+            depo["svgler"].move_to_end(anahtar)
+            return ozet, uri
+    uri = sparkline_svg_uret(vals)
+    with depo["kilit"]:
+        depo["svgler"][anahtar] = uri
+        while len(depo["svgler"]) > SPARK_ONBELLEK_SINIRI:
+            depo["svgler"].popitem(last=False)
+    return ozet, uri
+
+
+def doviz_cek_canli():
+    res = http_istek("GET", "https://www.doviz.com/", "doviz", timeout=5)
+    soup = BeautifulSoup(res.text, "html.parser")
+
+    def t(sid):
+        return float(
+            soup.find("span", {"data-socket-key": sid})
+            .text.strip()
+            .replace(".", "")
+            .replace(",", ".")
+        )
+
+    return {
+        "USD": t("USD"),
+        "EUR": t("EUR"),
+        "GBP": t("GBP"),
+        "gram-altin": t("gram-altin"),
+    }
+
+
+def yedek_kurlar():
+    return {
+        "USD": gecmis_fiyatlar.get("dolar_tl", 35.0),
+        "EUR": gecmis_fiyatlar.get("euro_tl", 0),
+        "GBP": gecmis_fiyatlar.get("sterlin_tl", 0),
+        "gram-altin": gecmis_fiyatlar.get("gram_altin_tl", 0),
+    }
+
+
+def doviz_cek():
+    kayit = onbellekli_fiyat("doviz", "", doviz_cek_canli)
+    return kayit["deger"] if kayit else yedek_kurlar()
+
+
+def kripto_fiyat_cek(kripto_sozlugu):
+    ids = ",".join(kripto_sozlugu.keys())
+    if not ids:
+        return {}
+    try:
+        return http_istek(
+            "GET",
+            f"https://api.coingecko.com/api/v3/simple/price?ids={ids}&vs_currencies=usd",
+            "coingecko",
             timeout=5,
         ).json()
     except:
         return {}
 
 
+def yahoo_toplu_kapanis(semboller, period="1d", interval="1d", baslangic=None, bitis=None):
+    # Tüm semboller tek yf.download isteğiyle çekilir; sonuç {SEMBOL: Close serisi}.
+    # baslangic ("YYYY-MM-DD") verilirse period yerine o günden çekilir; bitis (hariç) verilmezse bugüne kadar.
+    semboller = list(dict.fromkeys(s.upper() for s in semboller if s))
+    if not semboller or devre_acik("yahoo"):
+        return {}
+    aralik = {"start": baslangic} if baslangic else {"period": period}
+    if baslangic and bitis:
+        aralik["end"] = bitis
+    t0 = time.perf_counter()
+    try:
+        df = yf.download(
+            semboller,
+            **aralik,
+            interval=interval,
+            group_by="ticker",
+            auto_adjust=True,
+            progress=False,
+            threads=True,
+        )
+    except Exception as e:
+        olcum_kaydet("yahoo", time.perf_counter() - t0, False, str(e))
+        return {}
+    if df is None or df.empty:
+        olcum_kaydet("yahoo", time.perf_counter() - t0, False, "boş yanıt")
+        return {}
+    olcum_kaydet("yahoo", time.perf_counter() - t0, True)
+    sonuc = {}
+    for s in semboller:
+        try:
+            if isinstance(df.columns, pd.MultiIndex):
+                seri = df[s]["Close"]
+            else:
+                seri = df["Close"]
+            seri = seri.dropna()
+            if not seri.empty:
+                sonuc[s] = seri
+        except:
+            continue
+    return sonuc
+
+
+def borsa_doviz_fiyat(h):
+    try:
+        r = http_istek(
+            "GET",
+            f"https://borsa.doviz.com/hisseler/{h.split('.')[0].lower()}",
+            "borsa_doviz",
+            timeout=5,
+        )
+        return float(
+            BeautifulSoup(r.text, "html.parser")
+            .find("div", {"class": "text-xl font-semibold"})
+            .text.strip()
+            .replace(".", "")
+            .replace(",", ".")
+        )
+    except:
+        return 0
+
+
 def hisse_fiyat_cek(hisse_listesi):
+    hisse_listesi = list(hisse_listesi)
+    seriler = yahoo_toplu_kapanis(hisse_listesi, period="1d")
     res = {}
+    eksikler = []
     for h in hisse_listesi:
-        try:
-            t_obj = yf.Ticker(h)
-            hist = t_obj.history(period="1d")
-            f = hist["Close"].iloc[-1] if not hist.empty else 0
-            if (h.upper() == "GMSTR.IS" and f < 100) or f <= 0:
-                r = requests.get(
-                    f"https://borsa.doviz.com/hisseler/{h.split('.')[0].lower()}",
-                    timeout=5,
-                )
-                f = float(
-                    BeautifulSoup(r.text, "html.parser")
-                    .find("div", {"class": "text-xl font-semibold"})
-                    .text.strip()
-                    .replace(".", "")
-                    .replace(",", ".")
+        seri = seriler.get(h.upper())
+        f = float(seri.iloc[-1]) if seri is not None else 0
+        if (h.upper() == "GMSTR.IS" and f < 100) or f <= 0:
+            eksikler.append(h)
+        res[h] = f
+
+    # Yahoo'nun fiyatlayamadığı semboller için borsa.doviz.com paralel taranır
+    if eksikler:
+        with ThreadPoolExecutor(max_workers=min(8, len(eksikler))) as havuz:
+            for h, f in zip(eksikler, havuz.map(borsa_doviz_fiyat, eksikler)):
+                res[h] = f
+    return res
+
+
+# --- TABLO OLUŞTURUCU ---
+TABLO_KOLONLARI = (
+    "Varlık",
+    "24s",
+    "Miktar",
+    "Maliyet ($)",
+    "Birim Fiyat ($)",
+    "K/Z %",
+    "Değer (TL)",
+    "Değ% (TL)",
+    "Değer ($)",
+    "Değ% ($)",
+)
+PARA_KOLONLARI = {
+    "Maliyet ($)": "$",
+    "Birim Fiyat ($)": "$",
+    "Değer ($)": "$",
+    "Değer (TL)": "₺",
+}
+
+
+@st.cache_data(show_spinner=False)
+def tablo_iskeleti(cols):
+    thead = "".join(f"<th>{c}</th>" for c in cols)
+    return (
+        "<div class='yf-table-wrap'>"
+        "<table class='yf-table'>"
+        f"<thead><tr>{thead}</tr></thead><tbody>",
+        "</tbody></table></div>",
+    )
+
+
+def kolon_sayilari(df, col):
+    return df[col].to_numpy(dtype=float)
+
+
+def yuzde_renkleri(vals):
+    return np.where(vals < 0, "#ff5f6d", np.where(vals > 0, "#00d084", "#cbd5e1"))
+
+
+def yuzde_kolonu(vals):
+    return [
+        f"<span style='color:{r}'>{m}</span>"
+        for r, m in zip(yuzde_renkleri(vals), np.char.mod("%+.2f%%", vals))
+    ]
+
+
+def tablo_satirlari_html(df, sparklar, tooltipler, cols=TABLO_KOLONLARI):
+    # Her kolon tek seferde biçimlenir; satır başına bir "<tr>...</tr>" metni döner
+    kolonlar = {}
+    for col in cols:
+        if col == "24s":
+            kolonlar[col] = [
+                f"<span class='spk spk-{o}'></span>"
+                if u
+                else "<span style='color:#5b6b83'>-</span>"
+                for o, u in sparklar
+            ]
+        elif col in PARA_KOLONLARI:
+            sembol = PARA_KOLONLARI[col]
+            kolonlar[col] = [f"{sembol}{v:,.2f}" for v in kolon_sayilari(df, col)]
+        elif col in ["K/Z %", "Değ% (TL)"]:
+            kolonlar[col] = yuzde_kolonu(kolon_sayilari(df, col))
+        elif col == "Değ% ($)":
+            vals = kolon_sayilari(df, col)
+            kolonlar[col] = [
+                f"<span title=\"{t}\" style='color:{r}; cursor:help;'>{m}</span>"
+                for t, r, m in zip(
+                    tooltipler, yuzde_renkleri(vals), np.char.mod("%+.2f%%", vals)
                 )
-            res[h] = f
+            ]
+        elif col == "Miktar":
+            kolonlar[col] = [f"{v:,.6f}" for v in kolon_sayilari(df, col)]
+        else:
+            kolonlar[col] = df[col].astype(str).tolist()
+
+    return [
+        "<tr><td>" + "</td><td>".join(hucreler) + "</td></tr>"
+        for hucreler in zip(*(kolonlar[c] for c in cols))
+    ]
+
+
+def tablo_html_birlestir(satirlar, sparklar, cols=TABLO_KOLONLARI):
+    stil = "".join(
+        f".spk-{o}{{background-image:url(\"{u}\")}}" for o, u in dict(sparklar).items() if u
+    )
+    bas, son = tablo_iskeleti(tuple(cols))
+    return f"<style>{stil}</style>{bas}{''.join(satirlar)}{son}"
+
+
+def satir_surumu(vid, tip):
+    # Satır içeriğini fiyat dışında etkileyenler: haberin geliş zamanı, sparkline sembolü (arka
+    # planda keşfedilebilir) ve saatlik bar penceresi
+    kayit = HABER_DEPOSU["sonuclar"].get(varlik_haber_sorgusu(vid, tip))
+    return (
+        kayit["zaman"] if kayit else None,
+        varlik_yf_sembol(vid, tip),
+        int(time.time() // BAR_TTL),
+    )
+
+
+def artimli_tablo_html(tablo, df, kodlar, tip):
+    # Oturum başına satır önbelleği: değerleri ve sürümü değişmeyen satırın ipucu, sparkline'ı
+    # ve HTML'i yeniden üretilmez; yalnızca değişen satırlar biçimlenir. (html, değişen) döner.
+    onbellekler = st.session_state.setdefault("satir_onbellegi", {})
+    eski = onbellekler.get(tablo, {})
+    anahtarlar = [
+        (kod, satir_surumu(kod, tip)) + tuple(satir)
+        for kod, satir in zip(kodlar, df.itertuples(index=False))
+    ]
+    eksik = [i for i, a in enumerate(anahtarlar) if a not in eski]
+    yeni = {}
+    if eksik:
+        alt = df.iloc[eksik]
+        tooltipler = [
+            html.escape(degisim_tooltip_olustur(kodlar[i], tip, deg), quote=True)
+            for i, deg in zip(eksik, alt["Değ% ($)"].tolist())
+        ]
+        sparklar = [sparkline_svg(varlik_yf_sembol(kodlar[i], tip)) for i in eksik]
+        satirlar = tablo_satirlari_html(alt, sparklar, tooltipler)
+        for i, satir, spark in zip(eksik, satirlar, sparklar):
+            yeni[anahtarlar[i]] = (satir, spark)
+    # Yalnızca güncel satırlar tutulur; önbellek tablo boyutunu aşmaz
+    onbellekler[tablo] = {a: eski.get(a) or yeni[a] for a in anahtarlar}
+    satirlar, sparklar = zip(*(onbellekler[tablo][a] for a in anahtarlar))
+    return tablo_html_birlestir(satirlar, sparklar), len(eksik)
+
+
+# --- FİYAT ÖNBELLEĞİ (TTL + STALE-WHILE-REVALIDATE) ---
+FIYAT_TTL = {"doviz": 60, "kripto": 60, "hisse": 300}
+
+
+@st.cache_resource
+def fiyat_havuzu():
+    return ThreadPoolExecutor(max_workers=6, thread_name_prefix="fiyat")
+
+
+@st.cache_resource
+def fiyat_onbellegi():
+    return {"kayitlar": {}, "yenilenen": set(), "kilit": threading.Lock()}
+
+
+FIYAT_HAVUZU = fiyat_havuzu()
+FIYAT_ONBELLEGI = fiyat_onbellegi()
+
+
+def fiyat_ttl(saglayici):
+    # Streamlit Secrets'ta [FIYAT_TTL] bölümüyle sağlayıcı başına ezilebilir
+    return ayar_oku(f"FIYAT_TTL.{saglayici}", float(FIYAT_TTL[saglayici]))
+
+
+def onbellek_yenile(saglayici, anahtar, cek, gecerli):
+    depo = FIYAT_ONBELLEGI
+    try:
+        deger = cek()
+        if gecerli(deger):
+            with depo["kilit"]:
+                depo["kayitlar"][(saglayici, anahtar)] = {
+                    "deger": deger,
+                    "zaman": time.time(),
+                }
+    except:
+        pass
+    finally:
+        with depo["kilit"]:
+            depo["yenilenen"].discard((saglayici, anahtar))
+    with depo["kilit"]:
+        return depo["kayitlar"].get((saglayici, anahtar))
+
+
+def onbellekli_fiyat(saglayici, anahtar, cek, gecerli=bool):
+    # Taze kayıt varsa doğrudan, bayatsa hemen eski değer döner ve arka planda yenilenir.
+    # Hiç kayıt yoksa senkron çekilir. Dönüş: {"deger", "zaman", "bayat"} ya da None.
+    depo = FIYAT_ONBELLEGI
+    k = (saglayici, anahtar)
+    with depo["kilit"]:
+        kayit = depo["kayitlar"].get(k)
+        if kayit and time.time() - kayit["zaman"] < fiyat_ttl(saglayici):
+            return dict(kayit, bayat=False)
+        if kayit:
+            if k not in depo["yenilenen"]:
+                depo["yenilenen"].add(k)
+                FIYAT_HAVUZU.submit(onbellek_yenile, saglayici, anahtar, cek, gecerli)
+            return dict(kayit, bayat=True)
+        depo["yenilenen"].add(k)
+    kayit = onbellek_yenile(saglayici, anahtar, cek, gecerli)
+    return dict(kayit, bayat=False) if kayit else None
+
+
+def kripto_gecerli(fiyatlar):
+    return isinstance(fiyatlar, dict) and any(
+        isinstance(v, dict) and v.get("usd", 0) > 0 for v in fiyatlar.values()
+    )
+
+
+def hisse_gecerli(fiyatlar):
+    return any(f > 0 for f in fiyatlar.values())
+
+
+def yas_metni(saniye):
+    if saniye < 60:
+        return f"{saniye:.0f} sn önce"
+    if saniye < 3600:
+        return f"{saniye / 60:.0f} dk önce"
+    return f"{saniye / 3600:.1f} sa önce"
+
+
+# --- FİYAT TOPLAMA AŞAMASI ---
+FIYAT_SURE_SINIRI = 8.0
+KAYNAK_ETIKETLERI = {"canli": "canlı", "kismi": "kısmi", "yedek": "yedek (fiyat_gecmis)"}
+FIYAT_KAYNAK_TURU = {"kripto": "kripto", "hisse": "hisse", "nakit": "doviz"}
+CANLI_ARALIK = 30
+CANLI_ARALIKLARI = [15, 30, 60, 120, 300]
+
+
+def fiyatlari_topla(veriler, sure_siniri=FIYAT_SURE_SINIRI):
+    # Üç sağlayıcı aynı anda başlatılır; toplam bekleme tek bir süre sınırıyla kısıtlıdır
+    havuz = FIYAT_HAVUZU
+    kripto_idler = list(veriler["kripto_paralar"].keys())
+    hisseler = list(veriler["hisseler"].keys())
+    isler = {
+        "doviz": havuz.submit(onbellekli_fiyat, "doviz", "", doviz_cek_canli),
+        "kripto": havuz.submit(
+            onbellekli_fiyat,
+            "kripto",
+            tuple(sorted(kripto_idler)),
+            lambda: kripto_fiyat_cek(veriler["kripto_paralar"]),
+            kripto_gecerli,
+        ),
+        "hisse": havuz.submit(
+            onbellekli_fiyat,
+            "hisse",
+            tuple(sorted(hisseler)),
+            lambda: hisse_fiyat_cek(hisseler),
+            hisse_gecerli,
+        ),
+    }
+    wait(list(isler.values()), timeout=sure_siniri)
+
+    def sonuc(ad):
+        is_ = isler[ad]
+        if not is_.done():
+            return None
+        try:
+            return is_.result()
         except:
-            res[h] = 0
-    return res
+            return None
+
+    kayitlar = {ad: sonuc(ad) for ad in isler}
+    simdi = time.time()
+    yas = {
+        ad: (simdi - k["zaman"]) for ad, k in kayitlar.items() if k is not None
+    }
+    bayat = {ad: k["bayat"] for ad, k in kayitlar.items() if k is not None}
+
+    def deger(ad):
+        return kayitlar[ad]["deger"] if kayitlar[ad] is not None else None
+
+    durum = {}
+
+    kurlar = deger("doviz")
+    if kurlar:
+        durum["doviz"] = "canli"
+    else:
+        kurlar = yedek_kurlar()
+        durum["doviz"] = "yedek"
+
+    k_fiyatlar = dict(deger("kripto") or {})
+    gelen = [vid for vid in kripto_idler if k_fiyatlar.get(vid, {}).get("usd", 0) > 0]
+    durum["kripto"] = (
+        "canli" if len(gelen) == len(kripto_idler) else "kismi" if gelen else "yedek"
+    )
+    for vid in kripto_idler:
+        if vid not in gelen:
+            k_fiyatlar[vid] = {"usd": gecmis_fiyatlar.get(f"{vid}_usd", 0)}
+
+    h_fiyatlar = dict(deger("hisse") or {})
+    gelen = [h for h in hisseler if h_fiyatlar.get(h, 0) > 0]
+    durum["hisse"] = (
+        "canli" if len(gelen) == len(hisseler) else "kismi" if gelen else "yedek"
+    )
+    for h in hisseler:
+        if h not in gelen:
+            para = "tl" if varlik_kaydi(h, "hisse")["para"] == "TRY" else "usd"
+            h_fiyatlar[h] = gecmis_fiyatlar.get(f"{h}_{para}", 0)
+
+    return {
+        "kurlar": kurlar,
+        "kripto": k_fiyatlar,
+        "hisse": h_fiyatlar,
+        "durum": durum,
+        "yas": yas,
+        "bayat": bayat,
+        "zaman": datetime.now(),
+    }
+
+
+def fiyat_durum_metni(anlik):
+    adlar = {"doviz": "Döviz", "kripto": "Kripto", "hisse": "Hisse"}
+    parcalar = []
+    for k, v in anlik["durum"].items():
+        metin = f"{adlar[k]}: {KAYNAK_ETIKETLERI[v]}"
+        if v != "yedek" and k in anlik["yas"]:
+            metin += f" ({yas_metni(anlik['yas'][k])}"
+            metin += ", yenileniyor)" if anlik["bayat"].get(k) else ")"
+        parcalar.append(metin)
+    return f"Fiyatlar {anlik['zaman'].strftime('%H:%M:%S')} — " + " · ".join(parcalar)
+
+
+# --- GEÇMİŞ DOLDURMA (BACKFILL) ---
+# Arşivde kaydı olmayan günler bugünkü miktarlar × o günün kapanışlarıyla doldurulur.
+# Her varlık sınıfı için tek toplu Yahoo indirmesi yapılır; USDTRY nakit grubuyla birlikte gelir.
+DOLDURMA_GUN = 90
+DOLDURMA_BIRLESTIRME = 14
+ONS_GRAM = 31.1035
+DOLDURMA_CARPANLARI = {"gram_altin": 1 / ONS_GRAM}
+DOLDURMA_KATEGORILERI = [
+    ("kripto_paralar", "kripto", "kripto"),
+    ("nakit_ve_emtia", "nakit", "nakit"),
+    ("hisseler", "hisse", "borsa"),
+]
+
+
+def eksik_gunler(gun_sayisi):
+    bugun = pd.Timestamp(datetime.now().date())
+    gunler = pd.date_range(
+        bugun - pd.Timedelta(days=gun_sayisi), bugun - pd.Timedelta(days=1)
+    )
+    kayitli = portfoy_kolonlari(f"{gunler[0]:%Y-%m-%d} 00:00")["tarih"].astype("datetime64[D]")
+    return gunler[~gunler.isin(kayitli)]
+
+
+def gunluk_kapanis_tablosu(seriler, gunler):
+    # Saat dilimli/tatilli seriler takvim günlerine hizalanır; boşluklar önceki kapanışla dolar
+    kolonlar = {}
+    for sembol, seri in seriler.items():
+        indeks = pd.DatetimeIndex(seri.index)
+        if indeks.tz is not None:
+            indeks = indeks.tz_localize(None)
+        seri = pd.Series(seri.to_numpy(), index=indeks.normalize())
+        kolonlar[sembol] = seri.groupby(level=0).last()
+    if not kolonlar:
+        return pd.DataFrame(index=gunler)
+    tablo = pd.DataFrame(kolonlar)
+    return tablo.reindex(tablo.index.union(gunler)).ffill().reindex(gunler).bfill()
+
+
+def portfoy_varliklari(veriler):
+    # [(kategori, alan, vid, miktar, yf sembolü, fiyat para birimi), ...]
+    varliklar = []
+    for kat, tip, alan in DOLDURMA_KATEGORILERI:
+        for vid, data in veriler[kat].items():
+            kayit = varlik_kaydi(vid, tip)
+            sembol = (kayit["yf"] or "").upper()
+            if tip == "kripto":
+                para = "USD"
+            elif tip == "hisse":
+                para = kayit["para"]
+            else:
+                para = "TRY" if sembol.endswith("TRY=X") else "USD"
+            varliklar.append((kat, alan, vid, data["miktar"], sembol, para))
+    return varliklar
+
+
+def fiyat_kaynaklari(varliklar):
+    # Fiyat geçmişini belirleyen kısım (miktarsız); önbellek anahtarı olarak da kullanılır
+    return tuple((kat, vid, sembol, para) for kat, _, vid, _, sembol, para in varliklar)
+
+
+def varlik_fiyat_matrisi(kaynaklar, baslangic, gunler):
+    # (gün × varlık USD fiyat matrisi, USDTRY dizisi); USDTRY geçmişi alınamazsa None
+    gruplar = {kat: [] for kat, _, _ in DOLDURMA_KATEGORILERI}
+    gruplar["nakit_ve_emtia"].append("USDTRY=X")
+    for kat, _, sembol, _ in kaynaklar:
+        if sembol:
+            gruplar[kat].append(sembol)
+    # Yalnızca gunler'in son gününe kadar indirilir (yfinance'te end hariçtir)
+    bitis = f"{gunler[-1] + pd.Timedelta(days=1):%Y-%m-%d}"
+    seriler = {}
+    for semboller in gruplar.values():
+        seriler.update(
+            yahoo_toplu_kapanis(semboller, interval="1d", baslangic=baslangic, bitis=bitis)
+        )
+    tablo = gunluk_kapanis_tablosu(seriler, gunler)
+    if "USDTRY=X" not in tablo or tablo["USDTRY=X"].isna().all():
+        return None
+    usdtry = tablo["USDTRY=X"].to_numpy(float)
+    fiyat = np.empty((len(gunler), len(kaynaklar)))
+    for j, (_, vid, sembol, para) in enumerate(kaynaklar):
+        if sembol in tablo and not tablo[sembol].isna().all():
+            kolon = tablo[sembol].to_numpy(float) * DOLDURMA_CARPANLARI.get(vid.lower(), 1.0)
+            fiyat[:, j] = kolon / usdtry if para == "TRY" else kolon
+        else:
+            # Geçmişi bulunamayan varlık son bilinen fiyatıyla sabit kabul edilir
+            fiyat[:, j] = gecmis_fiyatlar.get(f"{vid}_usd", 0)
+    return np.nan_to_num(fiyat), usdtry
+
+
+def eksik_bloklari(eksik):
+    # Aralarında DOLDURMA_BIRLESTIRME günden uzun kayıtlı dönem kalan eksik günler ayrı indirilir;
+    # yakın boşluklar tek indirmede birleşir
+    bloklar = []
+    for gun in eksik:
+        if bloklar and (gun - bloklar[-1][-1]).days <= DOLDURMA_BIRLESTIRME:
+            bloklar[-1].append(gun)
+        else:
+            bloklar.append([gun])
+    return bloklar
+
+
+def portfoy_gecmisini_doldur(veriler, gun_sayisi=DOLDURMA_GUN):
+    # Eklenen gün sayısı döner; USDTRY geçmişi alınamazsa None (hiçbir gün yazılmaz)
+    eksik = eksik_gunler(gun_sayisi)
+    if len(eksik) == 0:
+        return 0
+    varliklar = portfoy_varliklari(veriler)
+    kaynaklar = fiyat_kaynaklari(varliklar)
+
+    # Fiyat matrisi (gün × varlık, USD) ile miktar matrisi (varlık × kategori) çarpılır
+    alanlar = [alan for _, _, alan in DOLDURMA_KATEGORILERI]
+    miktar = np.zeros((len(varliklar), len(alanlar)))
+    for j, (_, alan, _, mik, _, _) in enumerate(varliklar):
+        miktar[j, alanlar.index(alan)] = mik
+
+    kayitlar = []
+    for blok in eksik_bloklari(eksik):
+        # Hafta sonu/tatil ile başlayan aralıklarda önceki kapanış bulunabilsin diye bir hafta önceden çekilir
+        baslangic = f"{blok[0] - pd.Timedelta(days=7):%Y-%m-%d}"
+        gunler = pd.date_range(blok[0], blok[-1])
+        sonuc = varlik_fiyat_matrisi(kaynaklar, baslangic, gunler)
+        if sonuc is None:
+            return None
+        fiyat, usdtry = sonuc
+        usd = fiyat @ miktar
+        tl = usd * usdtry[:, None]
+        for i in np.flatnonzero(gunler.isin(blok)):
+            kayit = {"tarih": f"{gunler[i]:%Y-%m-%d} 23:59"}
+            for para, degerler in (("tl", tl[i]), ("usd", usd[i])):
+                for alan, deger in zip(alanlar, degerler):
+                    kayit[f"{alan}_{para}"] = round(float(deger), 2)
+                kayit[f"toplam_{para}"] = round(float(degerler.sum()), 2)
+            kayitlar.append(kayit)
+    arsive_toplu_ekle("gecmis_arsiv", kayitlar)
+    return len(kayitlar)
+
+
+# --- RİSK MOTORU (MONTE CARLO VaR/CVaR) ---
+# Son bir yılın günlük log getirilerinden (varlıklar + USDTRY) kovaryans kestirilir; sıfır
+# ortalamalı çok değişkenli normal günlük şoklarla yollar üretilir. Zararlar portföy değerine
+# oran olarak döner, gösterimde canlı toplamla çarpılır.
+RISK_GECMIS_GUN = 365
+RISK_SIMULASYON = 20000
+RISK_UFKU = 30
+RISK_GUVEN = (0.95, 0.99)
+RISK_PARCA = 4
+
+
+@st.cache_resource
+def risk_havuzu():
+    # NumPy üretici/matris işlemleri GIL'i bıraktığından parçalar iş parçacıklarında koşar
+    return ThreadPoolExecutor(max_workers=RISK_PARCA, thread_name_prefix="risk")
+
+
+RISK_HAVUZU = risk_havuzu()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def risk_getirileri(kaynaklar, gun):
+    # gun veri sürümüdür: kapanış geçmişi günde bir (ya da saatlik TTL ile) yenilenir
+    bitis = pd.Timestamp(gun) - pd.Timedelta(days=1)
+    gunler = pd.date_range(end=bitis, periods=RISK_GECMIS_GUN)
+    baslangic = f"{gunler[0] - pd.Timedelta(days=7):%Y-%m-%d}"
+    sonuc = varlik_fiyat_matrisi(kaynaklar, baslangic, gunler)
+    if sonuc is None:
+        return None
+    fiyat, usdtry = sonuc
+    seviyeler = np.column_stack((fiyat, usdtry))
+    # Fiyatı hiç bilinmeyen kolonlar sabit kabul edilir (getiri 0)
+    seviyeler = np.where(seviyeler > 0, seviyeler, 1.0)
+    return {
+        "getiriler": np.diff(np.log(seviyeler), axis=0),
+        "son_fiyat": fiyat[-1],
+        "gun_sayisi": len(gunler),
+    }
+
+
+def risk_parcasi(carpan, agirlik, adet, ufuk, tohum):
+    # Tek parça: (adet × ufuk × k) günlük şok; 1 günlük ve ufuk sonu oransal zararlar döner
+    rng = np.random.default_rng(tohum)
+    soklar = rng.standard_normal((adet, ufuk, carpan.shape[0])) @ carpan.T
+    sonuclar = {}
+    for gun, birikim in ((1, soklar[:, 0, :]), (ufuk, soklar.sum(axis=1))):
+        usd = np.exp(birikim[:, :-1]) @ agirlik
+        sonuclar[gun] = {"usd": 1 - usd, "tl": 1 - usd * np.exp(birikim[:, -1])}
+    return sonuclar
+
+
+@st.cache_data(show_spinner=False)
+def risk_simulasyonu(kaynaklar, miktarlar, gun):
+    # Anahtar: varlıklar + miktarlar (portföy) ve gün (veri sürümü)
+    veri = risk_getirileri(kaynaklar, gun)
+    if veri is None:
+        return None
+    degerler = np.asarray(miktarlar) * veri["son_fiyat"]
+    if degerler.sum() <= 0:
+        return None
+    agirlik = degerler / degerler.sum()
+    kovaryans = np.atleast_2d(np.cov(veri["getiriler"], rowvar=False))
+    # Tekil kovaryansta Cholesky yerine özdeğer ayrışımı (negatif özdeğerler sıfırlanır)
+    ozdeger, ozvektor = np.linalg.eigh(kovaryans)
+    carpan = ozvektor * np.sqrt(np.clip(ozdeger, 0, None))
+    tohumlar = np.random.SeedSequence(0).spawn(RISK_PARCA)
+    adet = -(-RISK_SIMULASYON // RISK_PARCA)
+    parcalar = list(
+        RISK_HAVUZU.map(
+            lambda t: risk_parcasi(carpan, agirlik, adet, RISK_UFKU, t), tohumlar
+        )
+    )
+    sonuc = {}
+    for ufuk in (1, RISK_UFKU):
+        for para in ("tl", "usd"):
+            zarar = np.concatenate([p[ufuk][para] for p in parcalar])
+            for guven in RISK_GUVEN:
+                var = np.quantile(zarar, guven)
+                sonuc[(ufuk, para, guven)] = {
+                    "var": float(var),
+                    "cvar": float(zarar[zarar >= var].mean()),
+                }
+    return {
+        "sonuc": sonuc,
+        "gun_sayisi": veri["gun_sayisi"],
+        "simulasyon": adet * RISK_PARCA,
+    }
+
+
+# --- NAKİT AKIŞI PROJEKSİYONU ---
+# Bütçe kalemleri (gelir, gider, bilgi amaçlı sabit gider) ay × kalem aktiflik maskesiyle
+# ileriye taşınır. Bitiş tarihi alanı boşsa kalem adındaki "(15.08.2030)" gibi tarih kullanılır;
+# tarihi olmayan kalem süresiz kabul edilir. Referans gün, eski grafikteki gibi ayın 15'idir.
+TARIH_KALIPLARI = [
+    (re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})"), (0, 1, 2)),
+    (re.compile(r"(\d{1,2})\.(\d{1,2})\.(\d{2,4})"), (2, 1, 0)),
+]
+PROJEKSIYON_GRUPLARI = ["Gelir", "Gider", "Sabit Gider (Bilgi)"]
+
+
+def bitis_tarihi_ayikla(*metinler):
+    for metin in metinler:
+        for kalip, (yil_i, ay_i, gun_i) in TARIH_KALIPLARI:
+            for eslesme in kalip.finditer(str(metin)):
+                parcalar = eslesme.groups()
+                yil = int(parcalar[yil_i])
+                yil = yil + 2000 if yil < 100 else yil
+                try:
+                    return np.datetime64(
+                        datetime(yil, int(parcalar[ay_i]), int(parcalar[gun_i])).date(), "D"
+                    )
+                except ValueError:
+                    continue
+    return np.datetime64("NaT", "D")
+
+
+@st.cache_data(show_spinner=False)
+def bitis_tarihleri(anahtarlar):
+    # ((bitis_tarihi alanı, kalem adı), ...) -> datetime64[D] dizisi; her kalem bir kez ayrıştırılır
+    return np.array(
+        [bitis_tarihi_ayikla(alan, ad) for alan, ad in anahtarlar], dtype="datetime64[D]"
+    )
+
+
+def butce_kalemleri(butce):
+    # [(grup, kalem adı, aylık tutar, bitiş tarihi metni), ...]
+    kalemler = [("Gelir", ad, tutar, "") for ad, tutar in butce["gelirler"].items()]
+    for kalemler_kat in butce["giderler"].values():
+        kalemler += [("Gider", ad, tutar, "") for ad, tutar in kalemler_kat.items()]
+    for ad, kayit in butce.get("aylik_sabit_gider_bilgi", {}).items():
+        tutar, bitis = kayit.get("tutar", 0.0), kayit.get("bitis_tarihi", "")
+        kalemler.append(("Sabit Gider (Bilgi)", ad, tutar, bitis))
+    return kalemler
+
+
+def projeksiyon_dizileri(butce):
+    kalemler = butce_kalemleri(butce)
+    grup = np.array([k[0] for k in kalemler])
+    tutar = np.array([float(k[2]) for k in kalemler], dtype=float)
+    bitis = bitis_tarihleri(tuple((k[3], k[1]) for k in kalemler))
+    return grup, tutar, bitis
+
+
+def projeksiyon_ufku(butce, simdi=None):
+    # En geç biten kalemin (kredi vadesi vb.) ayına kadar olan ay sayısı; en az 12
+    _, _, bitis = projeksiyon_dizileri(butce)
+    bitis = bitis[~np.isnat(bitis)]
+    if len(bitis) == 0:
+        return 12
+    bas = np.datetime64(f"{simdi or datetime.now():%Y-%m}", "M")
+    return max(12, int((bitis.max().astype("datetime64[M]") - bas).astype(int)) + 1)
+
+
+def nakit_akisi_projeksiyonu(butce, ay_sayisi=12, simdi=None):
+    grup, tutar, bitis = projeksiyon_dizileri(butce)
+    aylar = np.datetime64(f"{simdi or datetime.now():%Y-%m}", "M") + np.arange(ay_sayisi)
+    referans = aylar.astype("datetime64[D]") + 14
+    maske = np.isnat(bitis)[None, :] | (bitis[None, :] >= referans[:, None])
+    aylik = maske * tutar[None, :]
+    df = pd.DataFrame({"Ay": aylar.astype(str)})
+    for ad in PROJEKSIYON_GRUPLARI:
+        df[ad] = aylik[:, grup == ad].sum(axis=1)
+    df["Net"] = df["Gelir"] - df["Gider"]
+    return df
+
+
+# --- BÜTÇE TOPLU DÜZENLEME ---
+GIDER_KATEGORILERI = {
+    "Kredi Kartlari": "Kartlar",
+    "Sabit Giderler": "Sabit",
+    "Diger Borclar": "Diğer",
+}
+
+
+def tablodan_kalemler(df):
+    # Düzenleyici tablosundan {kalem: tutar}; boş adlı satırlar atlanır, aynı ad son satırla ezilir
+    kalemler = {}
+    for ad, tutar in zip(df["Kalem"], df["Tutar (₺)"]):
+        ad = "" if pd.isna(ad) else str(ad)
+        if ad.strip():
+            kalemler[ad] = 0.0 if pd.isna(tutar) else float(tutar)
+    return kalemler
+
+
+def tablodan_sabit_giderler(df):
+    kalemler = {}
+    satirlar = zip(df["Harcama Kalemi"], df["Tutar (₺)"], df["Son Bulma Tarihi"])
+    for ad, tutar, bitis in satirlar:
+        ad = "" if pd.isna(ad) else str(ad)
+        if ad.strip():
+            kalemler[ad] = {
+                "tutar": 0.0 if pd.isna(tutar) else float(tutar),
+                "bitis_tarihi": "" if pd.isna(bitis) else f"{pd.Timestamp(bitis):%Y-%m-%d}",
+            }
+    return kalemler
+
+
+def kalem_farki(eski, yeni):
+    # Eklenen + silinen + değişen kalem sayısı
+    return len(eski.keys() ^ yeni.keys()) + sum(
+        1 for k in eski.keys() & yeni.keys() if eski[k] != yeni[k]
+    )
+
+
+def butce_farki(eski, yeni):
+    fark = kalem_farki(eski["gelirler"], yeni["gelirler"])
+    fark += kalem_farki(
+        eski.get("aylik_sabit_gider_bilgi", {}), yeni["aylik_sabit_gider_bilgi"]
+    )
+    for kat in eski["giderler"].keys() | yeni["giderler"].keys():
+        fark += kalem_farki(eski["giderler"].get(kat, {}), yeni["giderler"].get(kat, {}))
+    return fark
 
 
 # --- NAVİGASYON ---
@@ -599,530 +2679,564 @@ st.sidebar.title("💳 Finans Merkezi")
 sayfa = st.sidebar.radio(
     "Menü:", ["Ana Panel", "Geçmiş Performans", "Bütçe Yönetimi", "Bütçe Arşivi"]
 )
+senkron_durum_goster()
 
 # --- ANA PANEL ---
 if sayfa == "Ana Panel":
     st.title("🚀 Varlık Kontrol Paneli")
-    kurlar = doviz_cek()
-    usd_try = kurlar.get("USD", 35.0)
-    k_fiyatlar = kripto_fiyat_cek(veriler["kripto_paralar"])
-    h_fiyatlar = hisse_fiyat_cek(veriler["hisseler"].keys())
-
-    if "man_f" not in st.session_state:
-        st.session_state.man_f = {}
-
-    def ciz_tablo(kat, varliklar, kaynak, tip):
-        # BU KISIM ARTIK DOĞRU GİRİNTİLENMİŞ DURUMDA
-        liste = []
-        kod_liste = []
-        t_tl, t_usd, t_e_tl, t_e_usd = 0, 0, 0, 0
-        for vid, data in varliklar.items():
-            mik, mal_usd = data["miktar"], data["maliyet_usd"]
-            man = st.session_state.man_f.get(f"m_{kat}_{vid}", 0)
-
-            # --- FİYAT HESAPLAMA MANTIĞI DÜZELTİLDİ ---
-            if tip == "kripto":
-                f_usd = man if man > 0 else kaynak.get(vid, {}).get("usd", 0)
-                if f_usd <= 0:
-                    f_usd = gecmis_fiyatlar.get(f"{vid}_usd", 0)
-                f_tl = f_usd * usd_try
-            
-            elif tip == "hisse":
-                raw_fiyat = man if man > 0 else kaynak.get(vid, 0)
-                
-                # EĞER HİSSE KODUNDA '.IS' YOKSA (AMZN, TSLA vb.) DOLAR BAZLIDIR
-                if ".is" not in vid.lower() and man == 0:
-                    f_usd = raw_fiyat
-                    if f_usd <= 0: # Hata varsa geçmiş veriyi kullan
+    canli_sol, canli_sag = st.columns([1, 3])
+    canli = canli_sol.toggle(
+        "🔴 Canlı Mod",
+        key="canli_mod",
+        help="Fiyatlar zamanlayıcıyla yenilenir; yalnızca süresi dolan sağlayıcılar çekilir.",
+    )
+    canli_aralik = canli_sag.select_slider(
+        "Yenileme Aralığı",
+        CANLI_ARALIKLARI,
+        value=CANLI_ARALIK,
+        format_func=lambda sn: f"{sn} sn",
+        disabled=not canli,
+        key="canli_aralik",
+    )
+    yenileme = canli_aralik if canli else None
+
+    # Bölümler ayrı fragment'lardır: kenar çubuğundaki ya da bir bölümdeki etkileşim yalnızca o
+    # bölümü yeniden çalıştırır. Risk bölümü fiyat tablolarıyla aynı fragment'ta, o turun
+    # toplamlarıyla çizilir; K/Z bölümüne toplamlar session_state ile geçer.
+    # Canlı modda fiyat tabloları ve K/Z bölümü yenileme aralığıyla kendiliğinden tekrar çalışır.
+    def fiyat_tablolari():
+        kripto_sembollerini_kesfet(veriler["kripto_paralar"].keys())
+        # Tüm varlıkların haberleri fiyatlar çekilirken paralel olarak yola çıkar
+        haber_toplu_iste(portfoy_haber_sorgulari(veriler))
+        fiyat_anlik = fiyatlari_topla(veriler)
+        kurlar = fiyat_anlik["kurlar"]
+        usd_try = kurlar.get("USD", 35.0)
+        k_fiyatlar = fiyat_anlik["kripto"]
+        h_fiyatlar = fiyat_anlik["hisse"]
+        st.caption(fiyat_durum_metni(fiyat_anlik))
+        referans = st.selectbox("Değ% Referansı", list(DEGISIM_REFERANSLARI))
+        seri = fiyat_serisi()
+        seri_anlik = {}
+        # Ekranda gösterilen fiyatlar; gecmis_fiyatlar (son kapanış) yalnızca GÜNÜ KAPAT'ta güncellenir
+        guncel_fiyatlar = {}
+        guncellenen = []
+
+        def referans_fiyat(vid, para, varsayilan):
+            # Seçilen geçmiş ana en yakın kayıtlı fiyat; yoksa son kapanış
+            geri = DEGISIM_REFERANSLARI[referans]
+            if geri is not None:
+                deger = fiyat_asof(seri, f"{vid}_{para}", time.time() - geri)
+                if deger is not None:
+                    return deger
+            return gecmis_fiyatlar.get(f"{vid}_{para}", varsayilan)
+
+        if "man_f" not in st.session_state:
+            st.session_state.man_f = {}
+
+        def ciz_tablo(kat, varliklar, kaynak, tip):
+            # BU KISIM ARTIK DOĞRU GİRİNTİLENMİŞ DURUMDA
+            liste = []
+            kod_liste = []
+            t_tl, t_usd, t_e_tl, t_e_usd = 0, 0, 0, 0
+            for vid, data in varliklar.items():
+                mik, mal_usd = data["miktar"], data["maliyet_usd"]
+                man = st.session_state.man_f.get(f"m_{kat}_{vid}", 0)
+                kayit = varlik_kaydi(vid, tip)
+
+                # --- FİYAT HESAPLAMA MANTIĞI DÜZELTİLDİ ---
+                if tip == "kripto":
+                    f_usd = man if man > 0 else kaynak.get(vid, {}).get("usd", 0)
+                    if f_usd <= 0:
                         f_usd = gecmis_fiyatlar.get(f"{vid}_usd", 0)
                     f_tl = f_usd * usd_try
-                else:
-                    # TÜRK HİSSESİ (TL BAZLI)
-                    f_tl = raw_fiyat
-                    # GMSTR gibi özel durum kontrolü
-                    if (vid.lower() == "gmstr.is" and f_tl < 100) or f_tl <= 0:
-                        f_tl = gecmis_fiyatlar.get(f"{vid}_tl", 0)
+            
+                elif tip == "hisse":
+                    raw_fiyat = man if man > 0 else kaynak.get(vid, 0)
+                
+                    # DOLAR BAZLI HİSSELER (AMZN, TSLA vb.)
+                    if kayit["para"] == "USD" and man == 0:
+                        f_usd = raw_fiyat
+                        if f_usd <= 0: # Hata varsa geçmiş veriyi kullan
+                            f_usd = gecmis_fiyatlar.get(f"{vid}_usd", 0)
+                        f_tl = f_usd * usd_try
+                    else:
+                        # TÜRK HİSSESİ (TL BAZLI)
+                        f_tl = raw_fiyat
+                        # GMSTR gibi özel durum kontrolü
+                        if (vid.lower() == "gmstr.is" and f_tl < 100) or f_tl <= 0:
+                            f_tl = gecmis_fiyatlar.get(f"{vid}_tl", 0)
+                        f_usd = f_tl / usd_try
+
+                else: # Nakit ve Emtia
+                    f_tl = man if man > 0 else kurlar.get(kayit["doviz"], 0)
                     f_usd = f_tl / usd_try
+                # ------------------------------------------
+
+                kz_yuzde = ((f_usd - mal_usd) / mal_usd * 100) if mal_usd > 0 else 0
+                t_tl += mik * f_tl
+                t_usd += mik * f_usd
+                ref_tl = referans_fiyat(vid, "tl", f_tl)
+                ref_usd = referans_fiyat(vid, "usd", f_usd)
+                t_e_tl += mik * ref_tl
+                t_e_usd += mik * ref_usd
+
+                liste.append(
+                    {
+                        "Varlık": vid.upper(),
+                        "Miktar": mik,
+                        "Maliyet ($)": mal_usd,
+                        "Birim Fiyat ($)": f_usd,
+                        "K/Z %": kz_yuzde,
+                        "Değer (TL)": mik * f_tl,
+                        "Değ% (TL)": fmt_yuzde(f_tl, ref_tl),
+                        "Değer ($)": mik * f_usd,
+                        "Değ% ($)": fmt_yuzde(f_usd, ref_usd),
+                    }
+                )
+                kod_liste.append(vid)
+                guncel_fiyatlar[f"{vid}_tl"], guncel_fiyatlar[f"{vid}_usd"] = f_tl, f_usd
+                # Yalnızca canlı kaynaktan gelen (elle girilmemiş) fiyatlar seriye yazılır
+                if man == 0 and fiyat_anlik["durum"][FIYAT_KAYNAK_TURU[tip]] == "canli":
+                    seri_anlik[f"{vid}_tl"], seri_anlik[f"{vid}_usd"] = f_tl, f_usd
+
+            st.subheader(kat.replace("_", " ").title())
+            if liste:
+                df = pd.DataFrame(liste)
+                table_html, degisen = artimli_tablo_html(kat, df, kod_liste, tip)
+                guncellenen.append(degisen)
+                st.markdown(table_html, unsafe_allow_html=True)
+                st.info(f"**Ara Toplam:** ₺{t_tl:,.2f} | ${t_usd:,.2f}")
+            return {"tl": t_tl, "usd": t_usd, "e_tl": t_e_tl, "e_usd": t_e_usd}
+
+        res_k = ciz_tablo("kripto_paralar", veriler["kripto_paralar"], k_fiyatlar, "kripto")
+        res_n = ciz_tablo("nakit_ve_emtia", veriler["nakit_ve_emtia"], None, "nakit")
+        res_h = ciz_tablo("hisseler", veriler["hisseler"], h_fiyatlar, "hisse")
+        fiyat_serisine_ekle(seri_anlik)
+        if yenileme:
+            st.caption(
+                f"🔴 Canlı · {yenileme} sn'de bir yenileniyor · "
+                f"son turda {sum(guncellenen)} satır güncellendi"
+            )
+        if haber_bekleyen_var():
+            haber_bekleyici()
 
-            else: # Nakit ve Emtia
-                f_tl = (
-                    man
-                    if man > 0
-                    else kurlar.get(
-                        {
-                            "dolar": "USD",
-                            "euro": "EUR",
-                            "sterlin": "GBP",
-                            "gram_altin": "gram-altin",
-                        }.get(vid),
-                        0,
-                    )
+        g_tl = res_k["tl"] + res_n["tl"] + res_h["tl"]
+        g_usd = res_k["usd"] + res_n["usd"] + res_h["usd"]
+        e_tl = res_k["e_tl"] + res_n["e_tl"] + res_h["e_tl"]
+        e_usd = res_k["e_usd"] + res_n["e_usd"] + res_h["e_usd"]
+
+        st.markdown("---")
+        c1, c2, c3 = st.columns(3)
+        c1.metric("GENEL TOPLAM (TL)", f"₺{g_tl:,.2f}", f"{fmt_yuzde(g_tl, e_tl):+.2f}%")
+        c2.metric("GENEL TOPLAM ($)", f"${g_usd:,.2f}", f"{fmt_yuzde(g_usd, e_usd):+.2f}%")
+        c3.metric("Dolar Kuru", f"₺{usd_try}")
+
+        ozet = {
+            "res_k": res_k,
+            "res_n": res_n,
+            "res_h": res_h,
+            "g_tl": g_tl,
+            "g_usd": g_usd,
+            "seri_anlik": seri_anlik,
+            "guncel_fiyatlar": guncel_fiyatlar,
+        }
+        st.session_state["panel_ozeti"] = ozet
+        risk_analizi(ozet)
+
+    def risk_analizi(ozet):
+        res_k, res_n, res_h = ozet["res_k"], ozet["res_n"], ozet["res_h"]
+        g_tl, g_usd = ozet["g_tl"], ozet["g_usd"]
+
+        # --- RİSK VE DAĞILIM ANALİZİ ---
+        st.markdown("### ⚖️ Portföy Risk ve Dağılım Analizi")
+
+        guvenli_hisse_tl = 0
+        for sembol, data in veriler["hisseler"].items():
+            if varlik_kaydi(sembol, "hisse")["risk"] == "guvenli":
+                guvenli_hisse_tl += data["miktar"] * ozet["guncel_fiyatlar"].get(
+                    f"{sembol}_tl", 0
                 )
-                f_usd = f_tl / usd_try
-            # ------------------------------------------
 
-            kz_yuzde = ((f_usd - mal_usd) / mal_usd * 100) if mal_usd > 0 else 0
-            t_tl += mik * f_tl
-            t_usd += mik * f_usd
-            t_e_tl += mik * gecmis_fiyatlar.get(f"{vid}_tl", f_tl)
-            t_e_usd += mik * gecmis_fiyatlar.get(f"{vid}_usd", f_usd)
+        riskli_hisse_degeri = max(0, res_h["tl"] - guvenli_hisse_tl)
+        guvenli_liman_degeri = res_n["tl"] + guvenli_hisse_tl
+        yuksek_risk_kripto_degeri = res_k["tl"]
+
+        toplam_servet = (
+            riskli_hisse_degeri + guvenli_liman_degeri + yuksek_risk_kripto_degeri
+        )
+        if toplam_servet <= 0:
+            toplam_servet = 1
+
+        m_oranlar = {
+            "Hisse (Şirket Riskli)": (riskli_hisse_degeri / toplam_servet) * 100,
+            "Güvenli Liman (Altın/Gümüş/Nakit)": (guvenli_liman_degeri / toplam_servet)
+            * 100,
+            "Yüksek Risk (Kripto)": (yuksek_risk_kripto_degeri / toplam_servet) * 100,
+        }
+
+        ideal_oranlar = {
+            "Hisse (Şirket Riskli)": 25.0,
+            "Güvenli Liman (Altın/Gümüş/Nakit)": 45.0,
+            "Yüksek Risk (Kripto)": 30.0,
+        }
 
-            liste.append(
+        analiz_df = []
+        for anahtar in m_oranlar.keys():
+            fark = m_oranlar[anahtar] - ideal_oranlar[anahtar]
+            durum = (
+                "✅ Dengeli" if abs(fark) < 5 else ("⚠️ Fazla" if fark > 0 else "📉 Eksik")
+            )
+            analiz_df.append(
                 {
-                    "Varlık": vid.upper(),
-                    "Miktar": mik,
-                    "Maliyet ($)": mal_usd,
-                    "Birim Fiyat ($)": f_usd,
-                    "K/Z %": kz_yuzde,
-                    "Değer (TL)": mik * f_tl,
-                    "Değ% (TL)": fmt_yuzde(
-                        f_tl, gecmis_fiyatlar.get(f"{vid}_tl", f_tl)
-                    ),
-                    "Değer ($)": mik * f_usd,
-                    "Değ% ($)": fmt_yuzde(
-                        f_usd, gecmis_fiyatlar.get(f"{vid}_usd", f_usd)
-                    ),
+                    "Varlık Sınıfı": anahtar,
+                    "Mevcut Oran": f"%{m_oranlar[anahtar]:.1f}",
+                    "İdeal Oran": f"%{ideal_oranlar[anahtar]:.1f}",
+                    "Fark": f"{fark:+.1f}%",
+                    "Durum": durum,
                 }
             )
-            kod_liste.append(vid)
-            gecmis_fiyatlar[f"{vid}_tl"], gecmis_fiyatlar[f"{vid}_usd"] = f_tl, f_usd
-
-        st.subheader(kat.replace("_", " ").title())
-        if liste:
-            df = pd.DataFrame(liste)
-            cols = [
-                "Varlık",
-                "24s",
-                "Miktar",
-                "Maliyet ($)",
-                "Birim Fiyat ($)",
-                "K/Z %",
-                "Değer (TL)",
-                "Değ% (TL)",
-                "Değer ($)",
-                "Değ% ($)",
-            ]
-            html_rows = []
-            for i, row in df.iterrows():
-                ozet = degisim_tooltip_olustur(kod_liste[i], tip, float(row["Değ% ($)"]))
-                tooltip = html.escape(ozet, quote=True)
-                spark = sparkline_svg(varlik_yf_sembol(kod_liste[i], tip))
-
-                def cfmt(col, val):
-                    if col == "24s":
-                        if spark:
-                            return f"<img src='{spark}' style='width:92px;height:24px;display:block;'/>"
-                        return "<span style='color:#5b6b83'>-</span>"
-                    if col in ["Maliyet ($)", "Birim Fiyat ($)", "Değer ($)"]:
-                        return f"${float(val):,.2f}"
-                    if col == "Değer (TL)":
-                        return f"₺{float(val):,.2f}"
-                    if col in ["K/Z %", "Değ% (TL)"]:
-                        renk = "#ff5f6d" if float(val) < 0 else ("#00d084" if float(val) > 0 else "#cbd5e1")
-                        return f"<span style='color:{renk}'>{float(val):+.2f}%</span>"
-                    if col == "Değ% ($)":
-                        renk = "#ff5f6d" if float(val) < 0 else ("#00d084" if float(val) > 0 else "#cbd5e1")
-                        return (
-                            f"<span title=\"{tooltip}\" style='color:{renk}; cursor:help;'>"
-                            f"{float(val):+.2f}%</span>"
-                        )
-                    if col == "Miktar":
-                        return f"{float(val):,.6f}"
-                    return str(val)
-
-                tds = "".join([f"<td>{cfmt(c, row.get(c, None))}</td>" for c in cols])
-                html_rows.append(f"<tr>{tds}</tr>")
-
-            thead = "".join([f"<th>{c}</th>" for c in cols])
-            table_html = (
-                "<div class='yf-table-wrap'>"
-                "<table class='yf-table'>"
-                f"<thead><tr>{thead}</tr></thead>"
-                f"<tbody>{''.join(html_rows)}</tbody>"
-                "</table></div>"
-            )
-            st.markdown(table_html, unsafe_allow_html=True)
-            st.info(f"**Ara Toplam:** ₺{t_tl:,.2f} | ${t_usd:,.2f}")
-        return {"tl": t_tl, "usd": t_usd, "e_tl": t_e_tl, "e_usd": t_e_usd}
-
-    res_k = ciz_tablo("kripto_paralar", veriler["kripto_paralar"], k_fiyatlar, "kripto")
-    res_n = ciz_tablo("nakit_ve_emtia", veriler["nakit_ve_emtia"], None, "nakit")
-    res_h = ciz_tablo("hisseler", veriler["hisseler"], h_fiyatlar, "hisse")
-
-    g_tl = res_k["tl"] + res_n["tl"] + res_h["tl"]
-    g_usd = res_k["usd"] + res_n["usd"] + res_h["usd"]
-    e_tl = res_k["e_tl"] + res_n["e_tl"] + res_h["e_tl"]
-    e_usd = res_k["e_usd"] + res_n["e_usd"] + res_h["e_usd"]
-
-    st.markdown("---")
-    c1, c2, c3 = st.columns(3)
-    c1.metric("GENEL TOPLAM (TL)", f"₺{g_tl:,.2f}", f"{fmt_yuzde(g_tl, e_tl):+.2f}%")
-    c2.metric("GENEL TOPLAM ($)", f"${g_usd:,.2f}", f"{fmt_yuzde(g_usd, e_usd):+.2f}%")
-    c3.metric("Dolar Kuru", f"₺{usd_try}")
-
-    # --- RİSK VE DAĞILIM ANALİZİ ---
-    st.markdown("### ⚖️ Portföy Risk ve Dağılım Analizi")
-
-    gumus_deger_tl = 0
-    altin_deger_tl = 0
-
-    for sembol, data in veriler["hisseler"].items():
-        s_upper = sembol.upper()
-        miktar = data["miktar"]
-        fiyat = gecmis_fiyatlar.get(f"{sembol}_tl", 0)
-
-        if "GMSTR" in s_upper:
-            gumus_deger_tl = miktar * fiyat
-        elif "GLDTR" in s_upper:
-            altin_deger_tl = miktar * fiyat
-
-    riskli_hisse_degeri = max(0, res_h["tl"] - (gumus_deger_tl + altin_deger_tl))
-    guvenli_liman_degeri = res_n["tl"] + gumus_deger_tl + altin_deger_tl
-    yuksek_risk_kripto_degeri = res_k["tl"]
-
-    toplam_servet = (
-        riskli_hisse_degeri + guvenli_liman_degeri + yuksek_risk_kripto_degeri
-    )
-    if toplam_servet <= 0:
-        toplam_servet = 1
-
-    m_oranlar = {
-        "Hisse (Şirket Riskli)": (riskli_hisse_degeri / toplam_servet) * 100,
-        "Güvenli Liman (Altın/Gümüş/Nakit)": (guvenli_liman_degeri / toplam_servet)
-        * 100,
-        "Yüksek Risk (Kripto)": (yuksek_risk_kripto_degeri / toplam_servet) * 100,
-    }
 
-    ideal_oranlar = {
-        "Hisse (Şirket Riskli)": 25.0,
-        "Güvenli Liman (Altın/Gümüş/Nakit)": 45.0,
-        "Yüksek Risk (Kripto)": 30.0,
-    }
+        st.table(pd.DataFrame(analiz_df))
 
-    analiz_df = []
-    for anahtar in m_oranlar.keys():
-        fark = m_oranlar[anahtar] - ideal_oranlar[anahtar]
-        durum = (
-            "✅ Dengeli" if abs(fark) < 5 else ("⚠️ Fazla" if fark > 0 else "📉 Eksik")
-        )
-        analiz_df.append(
-            {
-                "Varlık Sınıfı": anahtar,
-                "Mevcut Oran": f"%{m_oranlar[anahtar]:.1f}",
-                "İdeal Oran": f"%{ideal_oranlar[anahtar]:.1f}",
-                "Fark": f"{fark:+.1f}%",
-                "Durum": durum,
-            }
-        )
-
-    st.table(pd.DataFrame(analiz_df))
+        if m_oranlar["Yüksek Risk (Kripto)"] > 40:
+            st.warning(
+                "👉 Kripto ağırlığın hedeflediğin %30'un üzerinde. Kar realize etmeyi düşünebilirsin."
+            )
+        elif m_oranlar["Hisse (Şirket Riskli)"] < 15:
+            st.info(
+                "👉 Şirket hissesi ağırlığın düşük kalmış. Uzun vadeli büyüme için ekleme yapabilirsin."
+            )
 
-    if m_oranlar["Yüksek Risk (Kripto)"] > 40:
-        st.warning(
-            "👉 Kripto ağırlığın hedeflediğin %30'un üzerinde. Kar realize etmeyi düşünebilirsin."
-        )
-    elif m_oranlar["Hisse (Şirket Riskli)"] < 15:
-        st.info(
-            "👉 Şirket hissesi ağırlığın düşük kalmış. Uzun vadeli büyüme için ekleme yapabilirsin."
+        st.markdown("#### 🎲 Monte Carlo Risk (VaR / CVaR)")
+        risk_varliklari = portfoy_varliklari(veriler)
+        risk = risk_simulasyonu(
+            fiyat_kaynaklari(risk_varliklari),
+            tuple(v[3] for v in risk_varliklari),
+            datetime.now().strftime("%Y-%m-%d"),
         )
+        if risk is None:
+            st.info("Risk hesabı için fiyat geçmişi alınamadı.")
+        else:
+            risk_satirlari = []
+            for ufuk in (1, RISK_UFKU):
+                for guven in RISK_GUVEN:
+                    satir = {"Ufuk": f"{ufuk} Gün", "Güven": f"%{guven * 100:.0f}"}
+                    for para, etiket, sembol, toplam in (
+                        ("tl", "TL", "₺", g_tl),
+                        ("usd", "$", "$", g_usd),
+                    ):
+                        for olcu, ad in (("var", "VaR"), ("cvar", "CVaR")):
+                            oran = risk["sonuc"][(ufuk, para, guven)][olcu]
+                            satir[f"{ad} ({etiket})"] = (
+                                f"{sembol}{oran * toplam:,.0f} (%{oran * 100:.1f})"
+                            )
+                    risk_satirlari.append(satir)
+            st.table(pd.DataFrame(risk_satirlari))
+            st.caption(
+                f"{risk['simulasyon']:,} simülasyon · son {risk['gun_sayisi']} günün kovaryansı · "
+                "mevcut miktarlar"
+            )
 
-    st.markdown("### 📈 Maliyet/Değer Performansı (Kâr/Zarar)")
-    kat_maliyetler = {}
-    toplam_maliyet_usd = 0
-    kategoriler = {
-        "Kripto Paralar": veriler["kripto_paralar"],
-        "Nakit ve Emtia": veriler["nakit_ve_emtia"],
-        "Hisseler": veriler["hisseler"],
-    }
+    def kz_metrikleri():
+        ozet = st.session_state.get("panel_ozeti")
+        if ozet is None:
+            st.info("K/Z metrikleri fiyat tabloları yüklendikten sonra gösterilir.")
+            return
+        res_k, res_n, res_h = ozet["res_k"], ozet["res_n"], ozet["res_h"]
+        g_tl, g_usd = ozet["g_tl"], ozet["g_usd"]
+
+        st.markdown("### 📈 Maliyet/Değer Performansı (Kâr/Zarar)")
+        kat_maliyetler = {}
+        toplam_maliyet_usd = 0
+        kategoriler = {
+            "Kripto Paralar": veriler["kripto_paralar"],
+            "Nakit ve Emtia": veriler["nakit_ve_emtia"],
+            "Hisseler": veriler["hisseler"],
+        }
 
-    for ad, varlik_listesi in kategoriler.items():
-        m = sum(v["miktar"] * v["maliyet_usd"] for v in varlik_listesi.values())
-        kat_maliyetler[ad] = m
-        toplam_maliyet_usd += m
+        for ad, varlik_listesi in kategoriler.items():
+            m = sum(v["miktar"] * v["maliyet_usd"] for v in varlik_listesi.values())
+            kat_maliyetler[ad] = m
+            toplam_maliyet_usd += m
 
-    m1, m2, m3, m4 = st.columns(4)
+        m1, m2, m3, m4 = st.columns(4)
 
-    def kz_metrik_yaz(col, baslik, guncel_usd, maliyet_usd):
-        oran = (
-            ((guncel_usd - maliyet_usd) / maliyet_usd * 100) if maliyet_usd > 0 else 0
-        )
-        col.metric(baslik, f"{oran:+.2f}%", help=f"Toplam Maliyet: ${maliyet_usd:,.2f}")
-
-    kz_metrik_yaz(m1, "Kripto Paralar", res_k["usd"], kat_maliyetler["Kripto Paralar"])
-    kz_metrik_yaz(m2, "Nakit ve Emtia", res_n["usd"], kat_maliyetler["Nakit ve Emtia"])
-    kz_metrik_yaz(m3, "Hisseler", res_h["usd"], kat_maliyetler["Hisseler"])
-    kz_metrik_yaz(m4, "TÜM VARLIKLAR", g_usd, toplam_maliyet_usd)
-
-    if st.button("💰 GÜNÜ KAPAT"):
-        kayit = {
-            "tarih": datetime.now().strftime("%Y-%m-%d %H:%M"),
-            "Kripto (TL)": f"₺{res_k['tl']:,.0f}",
-            "Nakit (TL)": f"₺{res_n['tl']:,.0f}",
-            "Borsa (TL)": f"₺{res_h['tl']:,.0f}",
-            "Toplam (TL)": f"₺{g_tl:,.0f}",
-            "Değişim (TL)": f"{fmt_yuzde(g_tl, e_tl):+.2f}%",
-            "Kripto ($)": f"${res_k['usd']:,.0f}",
-            "Nakit ($)": f"${res_n['usd']:,.0f}",
-            "Borsa ($)": f"${res_h['usd']:,.0f}",
-            "Toplam ($)": f"${g_usd:,.0f}",
-            "Değişim ($)": f"{fmt_yuzde(g_usd, e_usd):+.2f}%",
-        }
-        gecmis_kayitlar.append(kayit)
-        github_a_kaydet("gecmis_arsiv.json", gecmis_kayitlar)
-        github_a_kaydet("fiyat_gecmis.json", gecmis_fiyatlar)
-        st.success("GitHub'a arşivlendi!")
-        st.rerun()
+        def kz_metrik_yaz(col, baslik, guncel_usd, maliyet_usd):
+            oran = (
+                ((guncel_usd - maliyet_usd) / maliyet_usd * 100) if maliyet_usd > 0 else 0
+            )
+            col.metric(baslik, f"{oran:+.2f}%", help=f"Toplam Maliyet: ${maliyet_usd:,.2f}")
+
+        kz_metrik_yaz(m1, "Kripto Paralar", res_k["usd"], kat_maliyetler["Kripto Paralar"])
+        kz_metrik_yaz(m2, "Nakit ve Emtia", res_n["usd"], kat_maliyetler["Nakit ve Emtia"])
+        kz_metrik_yaz(m3, "Hisseler", res_h["usd"], kat_maliyetler["Hisseler"])
+        kz_metrik_yaz(m4, "TÜM VARLIKLAR", g_usd, toplam_maliyet_usd)
+
+        if st.button("💰 GÜNÜ KAPAT"):
+            kayit = {
+                "tarih": datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "kripto_tl": round(res_k["tl"], 2),
+                "nakit_tl": round(res_n["tl"], 2),
+                "borsa_tl": round(res_h["tl"], 2),
+                "toplam_tl": round(g_tl, 2),
+                "kripto_usd": round(res_k["usd"], 2),
+                "nakit_usd": round(res_n["usd"], 2),
+                "borsa_usd": round(res_h["usd"], 2),
+                "toplam_usd": round(g_usd, 2),
+            }
+            arsive_ekle("gecmis_arsiv", kayit)
+            fiyat_serisine_ekle(ozet["seri_anlik"], zorla=True)
+            gecmis_fiyatlar.update(ozet["guncel_fiyatlar"])
+            github_a_kaydet("fiyat_gecmis.json", gecmis_fiyatlar)
+            st.success("GitHub'a arşivlendi!")
+            st.rerun()
+
+    st.fragment(fiyat_tablolari, run_every=yenileme)()
+    st.fragment(kz_metrikleri, run_every=yenileme)()
 
 # --- DİĞER SAYFALAR (GEÇMİŞ, BÜTÇE VS.) ---
 elif sayfa == "Geçmiş Performans":
     st.title("📜 Arşiv")
-    if not gecmis_kayitlar:
+    with st.expander("⏪ Eksik Günleri Doldur"):
+        st.caption(
+            "Arşivde kaydı olmayan günler bugünkü miktarlar ve o günün kapanışlarıyla hesaplanır."
+        )
+        doldurma_gun = st.number_input("Kaç gün geriye", 7, 730, DOLDURMA_GUN, step=7)
+        if st.button("Doldur"):
+            with st.spinner("Günlük kapanışlar indiriliyor..."):
+                eklenen = portfoy_gecmisini_doldur(veriler, int(doldurma_gun))
+            if eklenen is None:
+                st.error("USDTRY geçmişi alınamadı.")
+            elif eklenen:
+                st.success(f"{eklenen} gün eklendi.")
+                st.rerun()
+            else:
+                st.info("Eksik gün yok.")
+    baslangic, bitis = tarih_araligi_sec("gecmis_arsiv", "gecmis_tarih_araligi")
+    kol = portfoy_kolonlari(baslangic, bitis)
+    if len(kol["tarih"]) == 0:
         st.info("Yok.")
     else:
-        df_a = pd.DataFrame(gecmis_kayitlar)
-        df_a["Toplam_TL_Num"] = df_a["Toplam (TL)"].apply(temizle_sayi)
-        df_a["Toplam_USD_Num"] = df_a["Toplam ($)"].apply(temizle_sayi)
-
-        onceki_tl = df_a["Toplam_TL_Num"].shift(1)
-        onceki_usd = df_a["Toplam_USD_Num"].shift(1)
-
-        df_a["Deg_TL_Hesap"] = np.where(
-            onceki_tl.abs() > 0,
-            ((df_a["Toplam_TL_Num"] - onceki_tl) / onceki_tl.abs()) * 100,
-            0.0,
-        )
-        df_a["Deg_USD_Hesap"] = np.where(
-            onceki_usd.abs() > 0,
-            ((df_a["Toplam_USD_Num"] - onceki_usd) / onceki_usd.abs()) * 100,
-            0.0,
+        df_a = pd.DataFrame(
+            {"tarih": pd.DatetimeIndex(kol["tarih"]).strftime("%Y-%m-%d %H:%M")}
         )
+        for para, sembol in [("tl", "TL"), ("usd", "$")]:
+            for alan in ["kripto", "nakit", "borsa", "toplam"]:
+                df_a[PORTFOY_ALANLARI[f"{alan}_{para}"]] = kol[f"{alan}_{para}"]
+            df_a[f"Değişim ({sembol})"] = ardisik_degisim(kol[f"toplam_{para}"])
+
+        bicimler = {
+            ad: ("₺{:,.0f}" if alan.endswith("_tl") else "${:,.0f}")
+            for alan, ad in PORTFOY_ALANLARI.items()
+        }
+        bicimler.update({"Değişim (TL)": "{:+.2f}%", "Değişim ($)": "{:+.2f}%"})
+        gosterim_df = df_a.iloc[::-1]
+
+        if len(kol["tarih"]) > 1:
+            analizler = {para: performans_analizi(kol, para) for para in ["tl", "usd"]}
+            for para, sembol in [("tl", "TL"), ("usd", "$")]:
+                a = analizler[para]
+                son = a["gunluk"].iloc[-1]
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric(
+                    f"Değer Değişimi ({sembol})",
+                    f"{a['degisim'] * 100:+.2f}%",
+                    help="Anlık görüntüler arası oranların zinciri; para girişi ve alımlar ayıklanmaz.",
+                )
+                m2.metric(f"Maks. Düşüş ({sembol})", f"{a['max_dusus'] * 100:.2f}%")
+                m3.metric(
+                    f"Volatilite {ANALIZ_PENCERESI}g ({sembol})",
+                    "-" if pd.isna(son["oynaklik"]) else f"{son['oynaklik'] * 100:.1f}%",
+                )
+                m4.metric(
+                    f"Sharpe {ANALIZ_PENCERESI}g ({sembol})",
+                    "-" if pd.isna(son["sharpe"]) else f"{son['sharpe']:.2f}",
+                )
+            st.caption(
+                "Arşivde para giriş/çıkışı tutulmadığından ölçüler akış düzeltmesizdir: "
+                "varlık eklemek ya da miktar artırmak da getiri olarak görünür."
+            )
 
-        df_a["Değişim (TL)"] = df_a["Deg_TL_Hesap"].apply(lambda x: f"{x:+.2f}%")
-        df_a["Değişim ($)"] = df_a["Deg_USD_Hesap"].apply(lambda x: f"{x:+.2f}%")
+            def analiz_grafigi(ciz, alan, eksen, carpan=1.0):
+                df_g = pd.DataFrame(
+                    {
+                        sembol: analizler[para]["gunluk"][alan] * carpan
+                        for para, sembol in [("tl", "TL"), ("usd", "$")]
+                    }
+                )
+                fig = ciz(df_g, labels={"value": eksen, "index": "Tarih", "variable": ""})
+                fig.update_layout(height=300, margin=dict(l=10, r=10, t=30, b=10))
+                st.plotly_chart(fig, use_container_width=True)
+
+            g1, g2, g3, g4 = st.tabs(["Değer Değişimi", "Düşüş", "Volatilite / Sharpe", "Katkı"])
+            with g1:
+                analiz_grafigi(px.line, "birikim", "Birikimli Değişim (%)", 100)
+            with g2:
+                analiz_grafigi(px.area, "dusus", "Düşüş (%)", 100)
+            with g3:
+                analiz_grafigi(px.line, "oynaklik", "Yıllık Volatilite (%)", 100)
+                analiz_grafigi(px.line, "sharpe", "Sharpe")
+            with g4:
+                katki_df = pd.DataFrame(
+                    [
+                        {"Kategori": kat, "Para": sembol, "Katkı (%)": deger * 100}
+                        for para, sembol in [("tl", "TL"), ("usd", "$")]
+                        for kat, deger in analizler[para]["katki"].items()
+                    ]
+                )
+                fig = px.bar(
+                    katki_df, x="Kategori", y="Katkı (%)", color="Para", barmode="group"
+                )
+                st.plotly_chart(fig, use_container_width=True)
 
-        gosterim_df = df_a.iloc[::-1].drop(
-            columns=["Toplam_TL_Num", "Toplam_USD_Num", "Deg_TL_Hesap", "Deg_USD_Hesap"]
-        )
         st.dataframe(
-            gosterim_df.style.applymap(renk_stili, subset=["Değişim (TL)", "Değişim ($)"]),
+            gosterim_df.style.format(bicimler).applymap(
+                renk_stili, subset=["Değişim (TL)", "Değişim ($)"]
+            ),
             use_container_width=True,
         )
 
 elif sayfa == "Bütçe Yönetimi":
     st.title("📊 Bütçe")
     usd_val = doviz_cek().get("USD", 35.0)
-    c1, c2 = st.columns(2)
-    with c1:
-        st.subheader("Gelir")
-        y_g = st.text_input("Gelir Ekle")
-        if st.button("Ekle", key="gelir_btn") and y_g:
-            butce_verisi["gelirler"][y_g] = 0.0
-            github_a_kaydet("butce.json", butce_verisi)
-            st.rerun()
-        for k in list(butce_verisi["gelirler"].keys()):
-            c_del, c_val = st.columns([0.2, 1.8])
-            with c_del:
-                if st.button("−", key=f"sil_gel_{k}", help="Kalemi sil"):
-                    del butce_verisi["gelirler"][k]
-                    github_a_kaydet("butce.json", butce_verisi)
-                    st.rerun()
-            with c_val:
-                butce_verisi["gelirler"][k] = st.number_input(
-                    f"{k}", value=float(butce_verisi["gelirler"][k]), key=f"gel_{k}"
-                )
-        t_gel = sum(butce_verisi["gelirler"].values())
-        st.success(f"Top: ₺{t_gel:,.2f}")
+    # Tüm kalemler tek formda düzenlenir; form gönderilene kadar yeniden çalıştırma/yazım olmaz
+    st.caption(
+        "Satır eklemek için tablonun altındaki boş satırı, silmek için satır seçimini kullan. "
+        "Değişiklikler 'Kaydet' ile tek seferde yazılır."
+    )
+    surum = st.session_state.setdefault("butce_form_surumu", 0)
 
-        st.markdown("---")
-        st.subheader("Aylık Sabit Giderler (Bilgi Amaçlı)")
-        st.caption("Bu bölüm genel gelir-gider hesabına dahil edilmez.")
-        if "aylik_sabit_gider_bilgi" not in butce_verisi:
-            butce_verisi["aylik_sabit_gider_bilgi"] = {}
-
-        c_kalem, c_tutar, c_tarih = st.columns([2, 1, 1])
-        with c_kalem:
-            yeni_sabit_kalem = st.text_input(
-                "Harcama Kalemi",
-                key="yeni_sabit_kalem",
-                placeholder="Örn: İnternet",
+    def kalem_duzenle(baslik, kalemler, anahtar):
+        st.write(f"**{baslik}**")
+        df = st.data_editor(
+            pd.DataFrame(
+                {"Kalem": list(kalemler), "Tutar (₺)": [float(v) for v in kalemler.values()]}
+            ),
+            key=f"{anahtar}_{surum}",
+            num_rows="dynamic",
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "Kalem": st.column_config.TextColumn(required=True),
+                "Tutar (₺)": st.column_config.NumberColumn(format="%.2f", required=True),
+            },
+        )
+        return tablodan_kalemler(df)
+
+    with st.form("butce_formu"):
+        c1, c2 = st.columns(2)
+        with c1:
+            st.subheader("Gelir")
+            yeni_gelirler = kalem_duzenle(
+                "Gelirler", butce_verisi["gelirler"], "gelir_tablosu"
             )
-        with c_tutar:
-            yeni_sabit_tutar = st.number_input(
-                "Tutar",
-                min_value=0.0,
-                value=0.0,
-                key="yeni_sabit_tutar",
+            t_gel = sum(yeni_gelirler.values())
+            st.success(f"Top: ₺{t_gel:,.2f}")
+
+            st.markdown("---")
+            st.subheader("Aylık Sabit Giderler (Bilgi Amaçlı)")
+            st.caption("Bu bölüm genel gelir-gider hesabına dahil edilmez.")
+            sirali_kalemler = sorted(
+                butce_verisi.get("aylik_sabit_gider_bilgi", {}).items(),
+                key=lambda kv: float(kv[1].get("tutar", 0.0)),
+                reverse=True,
             )
-        with c_tarih:
-            yeni_sabit_bitis = st.text_input(
-                "Son Bulma Tarihi (YYYY-MM-DD)",
-                key="yeni_sabit_bitis",
-                placeholder="Örn: 2026-12-31",
+            bilgi_df = st.data_editor(
+                pd.DataFrame(
+                    {
+                        "Harcama Kalemi": [k for k, _ in sirali_kalemler],
+                        "Tutar (₺)": [
+                            float(v.get("tutar", 0.0)) for _, v in sirali_kalemler
+                        ],
+                        "Son Bulma Tarihi": [
+                            bitis_tarihi_ayikla(v.get("bitis_tarihi", ""))
+                            for _, v in sirali_kalemler
+                        ],
+                    }
+                ).astype({"Son Bulma Tarihi": "datetime64[ns]"}),
+                key=f"bilgi_tablosu_{surum}",
+                num_rows="dynamic",
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "Harcama Kalemi": st.column_config.TextColumn(required=True),
+                    "Tutar (₺)": st.column_config.NumberColumn(
+                        min_value=0.0, format="%.2f", required=True
+                    ),
+                    "Son Bulma Tarihi": st.column_config.DateColumn(format="YYYY-MM-DD"),
+                },
             )
-        if (
-            st.button("Sabit Gider Ekle/Güncelle", key="sabit_gider_ekle_btn")
-            and yeni_sabit_kalem
-        ):
-            bitis_tarihi = yeni_sabit_bitis.strip()
-            if bitis_tarihi:
+            yeni_bilgi = tablodan_sabit_giderler(bilgi_df)
+            bilgi_toplam = sum(v["tutar"] for v in yeni_bilgi.values())
+            st.info(f"Aylık Sabit Giderler Toplamı (Bilgi): ₺{bilgi_toplam:,.2f}")
+        with c2:
+            st.subheader("Gider")
+            yeni_giderler = dict(butce_verisi["giderler"])
+            for kat, baslik in GIDER_KATEGORILERI.items():
+                yeni_giderler[kat] = kalem_duzenle(
+                    baslik, butce_verisi["giderler"].get(kat, {}), f"gider_tablosu_{kat}"
+                )
+            t_gid = sum(sum(k.values()) for k in yeni_giderler.values())
+            st.error(f"Top: ₺{t_gid:,.2f}")
+        # Arşivleme de formun gönderimidir: kaydedilmemiş düzenlemeler önce kaydedilir,
+        # arşive formdaki güncel toplamlar yazılır
+        k1, k2 = st.columns(2)
+        kaydet = k1.form_submit_button("💾 Değişiklikleri Kaydet", type="primary")
+        arsivle = k2.form_submit_button("💾 KAYDET VE ARŞİVLE")
+
+    net = t_gel - t_gid
+    if kaydet or arsivle:
+        yeni_butce = {
+            "gelirler": yeni_gelirler,
+            "giderler": yeni_giderler,
+            "aylik_sabit_gider_bilgi": yeni_bilgi,
+        }
+        degisiklik = butce_farki(butce_verisi, yeni_butce)
+        if degisiklik:
+            butce_verisi.update(yeni_butce)
+            # Tablolar yeni veriyle sıfırdan kurulsun diye düzenleyici anahtarları yenilenir
+            st.session_state["butce_form_surumu"] = surum + 1
+        if arsivle:
+            net_usd = net / usd_val if usd_val else 0.0
+            onceki_net_usd = None
+            son_kayit = son_arsiv_kaydi("butce_arsiv")
+            if son_kayit:
                 try:
-                    datetime.strptime(bitis_tarihi, "%Y-%m-%d")
+                    onceki_net_usd = temizle_sayi(son_kayit.get("NET ($)", 0))
                 except:
-                    st.error("Son bulma tarihi formatı hatalı. YYYY-MM-DD gir.")
-                    bitis_tarihi = ""
-            butce_verisi["aylik_sabit_gider_bilgi"][yeni_sabit_kalem] = {
-                "tutar": float(yeni_sabit_tutar),
-                "bitis_tarihi": bitis_tarihi,
+                    onceki_net_usd = None
+            if onceki_net_usd is None or onceki_net_usd == 0:
+                degisim_yuzde = 0.0
+            else:
+                degisim_yuzde = ((net_usd - onceki_net_usd) / abs(onceki_net_usd)) * 100
+
+            b_k = {
+                "tarih": datetime.now().strftime("%Y-%m-%d %H:%M"),
+                "GELİR (TL)": f"₺{t_gel:,.0f}",
+                "GİDER (TL)": f"₺{t_gid:,.0f}",
+                "NET (TL)": f"₺{net:,.0f}",
+                "NET ($)": f"${net_usd:,.0f}",
+                "Değişim %": f"{degisim_yuzde:+.2f}%",
             }
+            arsive_ekle("butce_arsiv", b_k)
+        if degisiklik or arsivle:
             github_a_kaydet("butce.json", butce_verisi)
-            st.success(f"{yeni_sabit_kalem} listeye eklendi/güncellendi.")
-
-        bilgi_toplam = 0.0
-        st.markdown("**Sil** | **Harcama Kalemi** | **Tutar (₺)** | **Son Bulma Tarihi**")
-        sirali_kalemler = sorted(
-            butce_verisi["aylik_sabit_gider_bilgi"].items(),
-            key=lambda kv: float(
-                kv[1].get("tutar", 0.0) if isinstance(kv[1], dict) else kv[1]
-            ),
-            reverse=True,
-        )
-        for kalem, kayit in sirali_kalemler:
-            if not isinstance(kayit, dict):
-                kayit = {"tutar": float(kayit), "bitis_tarihi": ""}
-                butce_verisi["aylik_sabit_gider_bilgi"][kalem] = kayit
-            c_del, c_item, c_val, c_end = st.columns([0.2, 2.05, 0.95, 1.25])
-            with c_del:
-                if st.button("−", key=f"sil_bilgi_{kalem}", help="Kalemi sil"):
-                    del butce_verisi["aylik_sabit_gider_bilgi"][kalem]
-                    github_a_kaydet("butce.json", butce_verisi)
-                    st.rerun()
-            with c_item:
-                st.text_input(
-                    "Kalem",
-                    value=kalem,
-                    disabled=True,
-                    key=f"bilgi_kalem_{kalem}",
-                    label_visibility="collapsed",
-                )
-            with c_val:
-                val = st.number_input(
-                    "Tutar",
-                    min_value=0.0,
-                    value=float(kayit.get("tutar", 0.0)),
-                    key=f"bilgi_tutar_{kalem}",
-                    label_visibility="collapsed",
-                )
-            with c_end:
-                end_date = st.text_input(
-                    "Son Bulma Tarihi",
-                    value=str(kayit.get("bitis_tarihi", "")),
-                    key=f"bilgi_bitis_{kalem}",
-                    label_visibility="collapsed",
-                    placeholder="YYYY-MM-DD",
-                ).strip()
-            butce_verisi["aylik_sabit_gider_bilgi"][kalem] = {
-                "tutar": float(val),
-                "bitis_tarihi": end_date,
-            }
-            bilgi_toplam += float(val)
-        st.info(f"Aylık Sabit Giderler Toplamı (Bilgi): ₺{bilgi_toplam:,.2f}")
-
-        gelecek_12_ay = []
-        simdi = datetime.now()
-        for i in range(12):
-            yil = simdi.year + ((simdi.month - 1 + i) // 12)
-            ay = ((simdi.month - 1 + i) % 12) + 1
-            referans = datetime(yil, ay, 15)
-            ay_toplam = 0.0
-
-            for kayit in butce_verisi["aylik_sabit_gider_bilgi"].values():
-                if not isinstance(kayit, dict):
-                    continue
-                tutar = float(kayit.get("tutar", 0.0))
-                bitis_tarihi = str(kayit.get("bitis_tarihi", "")).strip()
-                aktif = True
-                if bitis_tarihi:
-                    try:
-                        bitis = datetime.strptime(bitis_tarihi, "%Y-%m-%d")
-                        if bitis < referans:
-                            aktif = False
-                    except:
-                        aktif = True
-                if aktif:
-                    ay_toplam += tutar
-
-            gelecek_12_ay.append(
-                {"Ay": referans.strftime("%Y-%m"), "Aylık Sabit Gider (₺)": ay_toplam}
-            )
-
-        df_12 = pd.DataFrame(gelecek_12_ay)
-    with c2:
-        st.subheader("Gider")
-        st.write("**Yeni Gider Kalemi Ekle/Güncelle**")
-        g1, g2, g3 = st.columns([1, 2, 1])
-        with g1:
-            gider_kat = st.selectbox(
-                "Kategori",
-                ["Kredi Kartlari", "Sabit Giderler", "Diger Borclar"],
-                format_func=lambda x: {
-                    "Kredi Kartlari": "Kartlar",
-                    "Sabit Giderler": "Sabit",
-                    "Diger Borclar": "Diğer",
-                }[x],
-                key="gider_kat_sec",
+            st.success(
+                "Arşivlendi!" if arsivle else f"{degisiklik} değişiklik kaydedildi."
             )
-        with g2:
-            yeni_gider_adi = st.text_input(
-                "Gider Kalemi", key="yeni_gider_adi", placeholder="Örn: Netflix"
-            )
-        with g3:
-            yeni_gider_tutar = st.number_input(
-                "Tutar (₺)", min_value=0.0, value=0.0, key="yeni_gider_tutar"
-            )
-        if st.button("Gider Ekle/Güncelle", key="gider_ekle_btn") and yeni_gider_adi:
-            butce_verisi["giderler"].setdefault(gider_kat, {})
-            butce_verisi["giderler"][gider_kat][yeni_gider_adi] = float(yeni_gider_tutar)
-            github_a_kaydet("butce.json", butce_verisi)
-            st.success(f"{yeni_gider_adi} eklendi/güncellendi.")
             st.rerun()
+        else:
+            st.info("Değişiklik yok.")
 
-        def but_ciz(b, a):
-            t = 0
-            st.write(f"**{b}**")
-            for n in list(butce_verisi["giderler"].get(a, {}).keys()):
-                c_del, c_val = st.columns([0.2, 1.8])
-                with c_del:
-                    if st.button("−", key=f"sil_{a}_{n}", help="Kalemi sil"):
-                        del butce_verisi["giderler"][a][n]
-                        github_a_kaydet("butce.json", butce_verisi)
-                        st.rerun()
-                v = butce_verisi["giderler"][a][n]
-                if isinstance(v, dict):
-                    v = float(
-                        v.get(
-                            "kart_toplami",
-                            v.get("tutar", sum(v.get("duzenli_odemeler", {}).values())),
-                        )
-                    )
-                with c_val:
-                    butce_verisi["giderler"][a][n] = st.number_input(
-                        f"{n}", value=float(v), key=f"v_{a}_{n}"
-                    )
-                t += butce_verisi["giderler"][a][n]
-            return t
-
-        t_gid = (
-            but_ciz("Kartlar", "Kredi Kartlari")
-            + but_ciz("Sabit", "Sabit Giderler")
-            + but_ciz("Diğer", "Diger Borclar")
-        )
-        st.error(f"Top: ₺{t_gid:,.2f}")
-
-    net = t_gel - t_gid
     st.markdown(
         f"<p style='font-size:24px;font-weight:700;margin:0 0 8px 0;'>Net: ₺{net:,.2f}</p>",
         unsafe_allow_html=True,
     )
+    ufuk_sinir = projeksiyon_ufku(butce_verisi)
+    ufuk = 12
+    if ufuk_sinir > 12:
+        ufuk = st.slider("Projeksiyon Ufku (Ay)", 12, ufuk_sinir, 12)
+    projeksiyon = nakit_akisi_projeksiyonu(butce_verisi, ufuk)
     g_col1, g_col2 = st.columns(2)
     with g_col1:
         fig_gel_gider = px.bar(
@@ -1136,10 +3250,10 @@ elif sayfa == "Bütçe Yönetimi":
         st.plotly_chart(fig_gel_gider, use_container_width=True)
     with g_col2:
         fig_12 = px.bar(
-            df_12,
+            projeksiyon,
             x="Ay",
-            y="Aylık Sabit Gider (₺)",
-            title="Önümüzdeki 12 Ay Sabit Gider (15'i)",
+            y="Sabit Gider (Bilgi)",
+            title=f"Önümüzdeki {ufuk} Ay Sabit Gider (15'i)",
         )
         fig_12.update_layout(
             xaxis_title="Ay",
@@ -1148,35 +3262,25 @@ elif sayfa == "Bütçe Yönetimi":
             margin=dict(l=10, r=10, t=40, b=10),
         )
         st.plotly_chart(fig_12, use_container_width=True)
-    if st.button("💾 ARŞİVLE"):
-        github_a_kaydet("butce.json", butce_verisi)
-        net_usd = net / usd_val if usd_val else 0.0
-        onceki_net_usd = None
-        if butce_arsivi:
-            try:
-                onceki_net_usd = temizle_sayi(butce_arsivi[-1].get("NET ($)", 0))
-            except:
-                onceki_net_usd = None
-        if onceki_net_usd is None or onceki_net_usd == 0:
-            degisim_yuzde = 0.0
-        else:
-            degisim_yuzde = ((net_usd - onceki_net_usd) / abs(onceki_net_usd)) * 100
-
-        b_k = {
-            "tarih": datetime.now().strftime("%Y-%m-%d %H:%M"),
-            "GELİR (TL)": f"₺{t_gel:,.0f}",
-            "GİDER (TL)": f"₺{t_gid:,.0f}",
-            "NET (TL)": f"₺{net:,.0f}",
-            "NET ($)": f"${net_usd:,.0f}",
-            "Değişim %": f"{degisim_yuzde:+.2f}%",
-        }
-        butce_arsivi.append(b_k)
-        github_a_kaydet("butce_arsiv.json", butce_arsivi)
-        st.success("Arşivlendi!")
-        st.rerun()
+    fig_akis = px.line(
+        projeksiyon,
+        x="Ay",
+        y=["Gelir", "Gider", "Net"],
+        title=f"Nakit Akışı Projeksiyonu ({ufuk} Ay)",
+        color_discrete_map={"Gelir": "green", "Gider": "red", "Net": "#1f77b4"},
+    )
+    fig_akis.update_layout(
+        yaxis_title="Tutar (₺)",
+        legend_title_text="",
+        height=300,
+        margin=dict(l=10, r=10, t=40, b=10),
+    )
+    st.plotly_chart(fig_akis, use_container_width=True)
 
 elif sayfa == "Bütçe Arşivi":
     st.title("📜 Bütçe Arşivi")
+    baslangic, bitis = tarih_araligi_sec("butce_arsiv", "butce_tarih_araligi")
+    butce_arsivi = list(arsiv_oku("butce_arsiv", baslangic, bitis))
     if not butce_arsivi:
         st.info("Yok.")
     else:
@@ -1187,33 +3291,51 @@ elif sayfa == "Bütçe Arşivi":
         )
 
 # SIDEBAR VARLIK EKLEME
-with st.sidebar.expander("➕ Varlık Yönetimi & Maliyet"):
-    kat_sec = st.selectbox("Kategori", ["hisseler", "kripto_paralar", "nakit_ve_emtia"])
-    kod_sec = st.text_input("Kod (Örn: btc, thyao.is)").lower().strip()
-    mik_sec = st.number_input("Yeni Toplam Miktar", value=0.0, format="%.8f")
-    fiy_sec = st.number_input("Son Alım Fiyatı ($)", value=0.0, format="%.4f")
-
-    col1, col2 = st.columns(2)
-    if col1.button("Kaydet/Güncelle"):
-        if kod_sec:
-            old = veriler[kat_sec].get(kod_sec, {"miktar": 0, "maliyet_usd": 0})
-            new_c = (
-                (
-                    (old["miktar"] * old["maliyet_usd"])
-                    + ((mik_sec - old["miktar"]) * fiy_sec)
+# Fragment: alanlarla oynamak yalnızca bu bölümü çalıştırır; kayıt/silme tüm sayfayı yeniler
+@st.fragment
+def varlik_yonetimi():
+    with st.expander("➕ Varlık Yönetimi & Maliyet"):
+        kat_sec = st.selectbox("Kategori", ["hisseler", "kripto_paralar", "nakit_ve_emtia"])
+        kod_sec = st.text_input("Kod (Örn: btc, thyao.is)").lower().strip()
+        mik_sec = st.number_input("Yeni Toplam Miktar", value=0.0, format="%.8f")
+        fiy_sec = st.number_input("Son Alım Fiyatı ($)", value=0.0, format="%.4f")
+
+        col1, col2 = st.columns(2)
+        if col1.button("Kaydet/Güncelle"):
+            if kod_sec:
+                old = veriler[kat_sec].get(kod_sec, {"miktar": 0, "maliyet_usd": 0})
+                new_c = (
+                    (
+                        (old["miktar"] * old["maliyet_usd"])
+                        + ((mik_sec - old["miktar"]) * fiy_sec)
+                    )
+                    / mik_sec
+                    if mik_sec > old["miktar"] and fiy_sec > 0
+                    else (old["maliyet_usd"] if fiy_sec == 0 else fiy_sec)
                 )
-                / mik_sec
-                if mik_sec > old["miktar"] and fiy_sec > 0
-                else (old["maliyet_usd"] if fiy_sec == 0 else fiy_sec)
-            )
-            veriler[kat_sec][kod_sec] = {"miktar": mik_sec, "maliyet_usd": new_c}
-            github_a_kaydet("varliklarim.json", veriler)
-            st.success(f"{kod_sec} güncellendi.")
-            st.rerun()
+                veriler[kat_sec][kod_sec] = {"miktar": mik_sec, "maliyet_usd": new_c}
+                github_a_kaydet("varliklarim.json", veriler)
+                st.success(f"{kod_sec} güncellendi.")
+                st.rerun()
 
-    if col2.button("Varlığı Sil"):
-        if kod_sec in veriler[kat_sec]:
-            del veriler[kat_sec][kod_sec]
-            github_a_kaydet("varliklarim.json", veriler)
-            st.warning(f"{kod_sec} silindi.")
-            st.rerun()
+        if col2.button("Varlığı Sil"):
+            if kod_sec in veriler[kat_sec]:
+                del veriler[kat_sec][kod_sec]
+                github_a_kaydet("varliklarim.json", veriler)
+                st.warning(f"{kod_sec} silindi.")
+                st.rerun()
+
+
+with st.sidebar:
+    varlik_yonetimi()
+
+with st.sidebar.expander("🔌 Bağlantı Durumu"):
+    baglanti_df = http_durum_tablosu()
+    if baglanti_df.empty:
+        st.caption("Henüz dış istek yapılmadı.")
+    else:
+        st.dataframe(
+            baglanti_df.style.format({"Ort. ms": "{:.0f}", "Son ms": "{:.0f}"}),
+            use_container_width=True,
+            hide_index=True,
+        )
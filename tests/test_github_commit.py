@@ -0,0 +1,148 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import streamlit as st
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ag_katmani  # noqa: E402
+
+
+class SahteGithub(BaseHTTPRequestHandler):
+    # git/ref, git/commits, git/trees ve git/refs uçlarının yerel karşılığı
+    def log_message(self, *args):
+        pass
+
+    def yanit(self, kod, govde):
+        veri = json.dumps(govde).encode()
+        self.send_response(kod)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(veri)))
+        self.end_headers()
+        self.wfile.write(veri)
+
+    def govde(self):
+        uzunluk = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(uzunluk) or b"null")
+
+    def do_GET(self):
+        durum = self.server.durum
+        yol = self.path.split("/repos/sahip/depo/", 1)[1]
+        durum["istekler"].append(("GET", yol, None))
+        if yol == "git/ref/heads/main":
+            return self.yanit(200, {"object": {"sha": durum["uc"]}})
+        if yol.startswith("git/commits/"):
+            sha = yol.rsplit("/", 1)[1]
+            return self.yanit(200, {"sha": sha, "tree": {"sha": f"agac-{sha}"}})
+        self.yanit(404, {"message": "Not Found"})
+
+    def do_POST(self):
+        durum = self.server.durum
+        yol = self.path.split("/repos/sahip/depo/", 1)[1]
+        govde = self.govde()
+        durum["istekler"].append(("POST", yol, govde))
+        durum["sayac"] += 1
+        if yol == "git/trees":
+            return self.yanit(201, {"sha": f"agac-{durum['sayac']}"})
+        if yol == "git/commits":
+            return self.yanit(201, {"sha": f"commit-{durum['sayac']}"})
+        self.yanit(404, {"message": "Not Found"})
+
+    def do_PATCH(self):
+        durum = self.server.durum
+        yol = self.path.split("/repos/sahip/depo/", 1)[1]
+        govde = self.govde()
+        durum["istekler"].append(("PATCH", yol, govde))
+        if durum["patch_kodlari"]:
+            # Başka bir yazar dalı ilerletmiş gibi davranılır
+            durum["uc"] = f"baska-{len(durum['patch_kodlari'])}"
+            return self.yanit(
+                durum["patch_kodlari"].pop(0), {"message": "Update is not a fast forward"}
+            )
+        durum["uc"] = govde["sha"]
+        self.yanit(200, {"object": {"sha": govde["sha"]}})
+
+
+@pytest.fixture
+def sunucu():
+    sunucu = ThreadingHTTPServer(("127.0.0.1", 0), SahteGithub)
+    sunucu.durum = {"istekler": [], "uc": "c0", "sayac": 0, "patch_kodlari": []}
+    threading.Thread(target=sunucu.serve_forever, daemon=True).start()
+    yield sunucu
+    sunucu.shutdown()
+    sunucu.server_close()
+
+
+@pytest.fixture
+def ayar(sunucu, monkeypatch):
+    monkeypatch.setattr(
+        st,
+        "secrets",
+        {
+            "GITHUB_TOKEN": "test",
+            "GITHUB_REPO": "sahip/depo",
+            "GITHUB_API_URL": f"http://127.0.0.1:{sunucu.server_port}",
+        },
+    )
+    # Testler arasında önbelleğe alınmış dal ucu ve devre durumu taşınmaz
+    ag_katmani.GITHUB_DURUMU["uclar"].clear()
+    ag_katmani.HTTP_DURUMU["saglayicilar"].clear()
+    return ag_katmani.github_ayarlari()
+
+
+def sayim(sunucu, yontem, yol=None):
+    return sum(
+        1
+        for y, p, _ in sunucu.durum["istekler"]
+        if y == yontem and (yol is None or p.startswith(yol))
+    )
+
+
+def test_ilk_yazim_tek_agac_commit_ve_patch(ayar, sunucu):
+    sha = ag_katmani.github_commit_olustur(ayar, {"a.json": {"x": 1}}, "mesaj")
+
+    assert sha == "commit-2"
+    assert sayim(sunucu, "POST", "git/trees") == 1
+    assert sayim(sunucu, "POST", "git/commits") == 1
+    assert sayim(sunucu, "PATCH") == 1
+    istekler = sunucu.durum["istekler"]
+    agac = next(g for y, p, g in istekler if p == "git/trees")
+    assert agac["base_tree"] == "agac-c0"
+    assert agac["tree"][0]["path"] == "a.json"
+    commit = next(g for y, p, g in istekler if p == "git/commits")
+    assert commit["parents"] == ["c0"]
+
+
+def test_ikinci_yazim_dal_ucunu_onbellekten_alir(ayar, sunucu):
+    ilk = ag_katmani.github_commit_olustur(ayar, {"a.json": {"x": 1}}, "bir")
+    sunucu.durum["istekler"].clear()
+
+    ag_katmani.github_commit_olustur(ayar, {"a.json": {"x": 2}}, "iki")
+
+    assert sayim(sunucu, "GET") == 0
+    commit = next(g for y, p, g in sunucu.durum["istekler"] if p == "git/commits")
+    assert commit["parents"] == [ilk]
+
+
+def test_ileri_sarmayan_422_bir_kez_yeniden_denenir(ayar, sunucu):
+    sunucu.durum["patch_kodlari"] = [422]
+
+    ag_katmani.github_commit_olustur(ayar, {"a.json": {"x": 1}}, "mesaj")
+
+    assert sayim(sunucu, "PATCH") == 2
+    assert sayim(sunucu, "GET", "git/ref/") == 2
+    commitler = [g for y, p, g in sunucu.durum["istekler"] if p == "git/commits"]
+    assert commitler[-1]["parents"] == ["baska-1"]
+
+
+def test_ikinci_422_hata_firlatir(ayar, sunucu):
+    sunucu.durum["patch_kodlari"] = [422, 422]
+
+    with pytest.raises(RuntimeError):
+        ag_katmani.github_commit_olustur(ayar, {"a.json": {"x": 1}}, "mesaj")
+
+    assert sayim(sunucu, "PATCH") == 2